@@ -0,0 +1,76 @@
+"""
+Cost model calibration for bulk inserts: one multi-row VALUES statement versus array-bound executemany
+of a single-row INSERT, at growing batch sizes.
+
+Fits a line (statement cost + per-row cost, in milliseconds) to each method, prints the
+'BULK_INSERT_COSTS' database setting for the host, and the batch size where executemany starts to win.
+Rows go into a QTEMP declared global temporary table, so nothing is left on the host. Needs a
+reachable IBM i host configured through DJANGO_SETTINGS_MODULE:
+
+    PYTHONPATH=src:. DJANGO_SETTINGS_MODULE=tests.settings python benchmarks/bulk_insert.py
+"""
+import datetime
+import statistics
+import time
+
+import django
+
+SIZES = (2, 5, 10, 25, 50, 100, 250, 500, 1000)
+REPEAT = 5
+
+DECLARE = """
+DECLARE GLOBAL TEMPORARY TABLE SESSION.BULK_INSERT_BENCH (
+    ID INTEGER, NAME VARCHAR(50), AMOUNT DECIMAL(11, 2), CREATED TIMESTAMP
+) WITH REPLACE NOT LOGGED
+"""
+INSERT = 'INSERT INTO SESSION.BULK_INSERT_BENCH (ID, NAME, AMOUNT, CREATED) VALUES '
+ROW = '(%s, %s, %s, %s)'
+
+
+def timed(connection, rows, executemany):
+    now = datetime.datetime.now()
+    params = [(i, f'name {i}', i / 100, now) for i in range(rows)]
+    timings = []
+    with connection.cursor() as cursor:
+        for _ in range(REPEAT):
+            started = time.perf_counter()
+            if executemany:
+                cursor.executemany(INSERT + ROW, params)
+            else:
+                cursor.execute(INSERT + ', '.join([ROW] * rows), [value for row in params for value in row])
+            timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+
+def fit(points):
+    """Least squares (intercept, slope) of [(rows, ms)]"""
+    mean_x = statistics.mean(x for x, _ in points)
+    mean_y = statistics.mean(y for _, y in points)
+    slope = sum((x - mean_x) * (y - mean_y) for x, y in points) / sum((x - mean_x) ** 2 for x, _ in points)
+    return mean_y - slope * mean_x, slope
+
+
+if __name__ == '__main__':
+    django.setup()
+    from django.db import connection
+
+    connection.databaseWrapper.fast_executemany = True
+    with connection.cursor() as cursor:
+        cursor.execute(DECLARE)
+    measured = {'VALUES': [], 'EXECUTEMANY': []}
+    for size in SIZES:
+        for method in measured:
+            elapsed = timed(connection, size, method == 'EXECUTEMANY')
+            measured[method].append((size, elapsed))
+            print(f'{method.lower():<12} rows={size:>5} median={elapsed:8.2f}ms')
+
+    costs = {}
+    for method, points in measured.items():
+        costs[f'{method}_STATEMENT'], costs[f'{method}_ROW'] = fit(points)
+    print("'BULK_INSERT_COSTS':", {name: round(cost, 4) for name, cost in costs.items()})
+    row_saving = costs['VALUES_ROW'] - costs['EXECUTEMANY_ROW']
+    if row_saving > 0:
+        crossover = (costs['EXECUTEMANY_STATEMENT'] - costs['VALUES_STATEMENT']) / row_saving
+        print(f'executemany is cheaper from {max(crossover, 2):.0f} rows')
+    else:
+        print('multi-row VALUES is cheaper at every size')
@@ -0,0 +1,55 @@
+"""
+bulk_update() throughput: one MERGE against a VALUES table per batch versus Django's CASE WHEN chains
+('BULK_UPDATE': 'CASE'), at 1k, 10k and 100k objects.
+
+Needs a reachable IBM i host configured through DJANGO_SETTINGS_MODULE, e.g. tests.settings with the
+TEST_SYSTEM_* environment variables set; a scratch table is created and dropped again:
+
+    PYTHONPATH=src:. DJANGO_SETTINGS_MODULE=tests.settings \
+        python benchmarks/bulk_update.py [OBJECTS ...]
+"""
+import sys
+import time
+
+TABLE = 'DJANGO_ISERIES_BULK_UPDATE_BENCH'
+DEFAULT_OBJECTS = (1_000, 10_000, 100_000)
+
+
+def main(sizes):
+    import django
+    django.setup()
+    from django.db import connection, models, transaction
+
+    class Account(models.Model):
+        name = models.CharField(max_length=50)
+        balance = models.DecimalField(max_digits=11, decimal_places=2)
+
+        class Meta:
+            app_label = 'tests'
+            db_table = TABLE
+
+    with connection.schema_editor() as editor:
+        editor.create_model(Account)
+    try:
+        for count in sizes:
+            Account.objects.all().delete()
+            Account.objects.bulk_create(Account(name=f'account {i}', balance=0) for i in range(count))
+            accounts = list(Account.objects.all())
+            for method in ('MERGE', 'CASE'):
+                connection.features.__dict__['supports_bulk_update_merge'] = method == 'MERGE'
+                for account in accounts:
+                    account.balance += 1
+                batch_size = connection.ops.bulk_batch_size([Account._meta.pk] * 2 + [Account._meta.get_field('balance'), Account._meta.get_field('name')], accounts)
+                started = time.perf_counter()
+                with transaction.atomic():
+                    Account.objects.bulk_update(accounts, ['balance', 'name'])
+                elapsed = time.perf_counter() - started
+                print(f'{method:<6} objects={count:>7} batch={batch_size:>5} {elapsed:8.2f}s {count / elapsed:10.0f} rows/s')
+    finally:
+        connection.features.__dict__.pop('supports_bulk_update_merge', None)
+        with connection.schema_editor() as editor:
+            editor.delete_model(Account)
+
+
+if __name__ == '__main__':
+    main([int(count) for count in sys.argv[1:]] or DEFAULT_OBJECTS)
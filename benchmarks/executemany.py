@@ -0,0 +1,44 @@
+"""
+Bulk write benchmark: plain executemany versus array-bound, batched executemany (FAST_EXECUTEMANY).
+
+Rows are inserted into a QTEMP declared global temporary table, so nothing is left on the host.
+Needs a reachable IBM i host configured through DJANGO_SETTINGS_MODULE:
+
+    PYTHONPATH=src:. DJANGO_SETTINGS_MODULE=tests.settings python benchmarks/executemany.py
+"""
+import datetime
+import time
+
+import django
+
+SIZES = (10_000, 100_000, 1_000_000)
+
+DECLARE = """
+DECLARE GLOBAL TEMPORARY TABLE SESSION.EXECUTEMANY_BENCH (
+    ID INTEGER, NAME VARCHAR(50), AMOUNT DECIMAL(11, 2), CREATED TIMESTAMP
+) WITH REPLACE NOT LOGGED
+"""
+INSERT = 'INSERT INTO SESSION.EXECUTEMANY_BENCH (ID, NAME, AMOUNT, CREATED) VALUES (%s, %s, %s, %s)'
+
+
+def run(connection, fast, rows):
+    connection.databaseWrapper.fast_executemany = fast
+    now = datetime.datetime.now()
+    params = [(i, f'name {i}', i / 100, now) for i in range(rows)]
+    with connection.cursor() as cursor:
+        cursor.execute(DECLARE)
+        started = time.perf_counter()
+        cursor.executemany(INSERT, params)
+        connection.commit()
+        elapsed = time.perf_counter() - started
+    print(f'{"fast" if fast else "plain":<6} rows={rows:>9} {elapsed:8.2f}s {rows / elapsed:12.0f} rows/s')
+
+
+if __name__ == '__main__':
+    django.setup()
+    from django.db import connection
+
+    connection.set_autocommit(False)
+    for size in SIZES:
+        for fast in (False, True):
+            run(connection, fast, size)
@@ -0,0 +1,60 @@
+"""
+Cost of reading inserted values back: plain single-row INSERTs versus the same INSERT wrapped in
+SELECT ... FROM FINAL TABLE with its row fetched, which is what the insert compiler emits when
+Django asks for returning fields.
+
+Prints the median latency per insert and the host CPU the job used per insert (CPU_TIME of
+QSYS2.ACTIVE_JOB_INFO for the current job). Rows go into a QTEMP declared global temporary table, so
+nothing is left on the host. Needs a reachable IBM i host configured through DJANGO_SETTINGS_MODULE:
+
+    PYTHONPATH=src:. DJANGO_SETTINGS_MODULE=tests.settings python benchmarks/insert_returning.py [INSERTS]
+"""
+import statistics
+import sys
+import time
+
+import django
+
+DEFAULT_INSERTS = 5_000
+
+DECLARE = """
+DECLARE GLOBAL TEMPORARY TABLE SESSION.INSERT_RETURNING_BENCH (
+    ID INTEGER GENERATED BY DEFAULT AS IDENTITY, NAME VARCHAR(50), AMOUNT DECIMAL(11, 2)
+) WITH REPLACE NOT LOGGED
+"""
+INSERT = 'INSERT INTO SESSION.INSERT_RETURNING_BENCH (NAME, AMOUNT) VALUES (%s, %s)'
+PATHS = {
+    'plain INSERT': (INSERT, False),
+    'FINAL TABLE': (f'SELECT ID FROM FINAL TABLE ({INSERT}) as INSERT_RETURNING_BENCH', True),
+}
+JOB_CPU = "SELECT CPU_TIME FROM TABLE(QSYS2.ACTIVE_JOB_INFO(JOB_NAME_FILTER => '*', DETAILED_INFO => 'NONE')) J"
+
+
+def job_cpu_ms(cursor):
+    cursor.execute(JOB_CPU)
+    return cursor.fetchone()[0]
+
+
+def run(cursor, sql, fetch, inserts):
+    timings = []
+    cpu_before = job_cpu_ms(cursor)
+    for i in range(inserts):
+        started = time.perf_counter()
+        cursor.execute(sql, [f'name {i}', i / 100])
+        if fetch:
+            cursor.fetchone()
+        timings.append(time.perf_counter() - started)
+    cpu = job_cpu_ms(cursor) - cpu_before
+    return statistics.median(timings) * 1000, cpu / inserts
+
+
+if __name__ == '__main__':
+    django.setup()
+    from django.db import connection
+
+    inserts = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_INSERTS
+    with connection.cursor() as cursor:
+        cursor.execute(DECLARE)
+        for name, (sql, fetch) in PATHS.items():
+            latency, cpu = run(cursor, sql, fetch, inserts)
+            print(f'{name:<13} inserts={inserts} median={latency:7.3f}ms host cpu={cpu:7.4f}ms per insert')
@@ -0,0 +1,72 @@
+"""
+Latency of a reporting query while another job holds row locks, with and without WITH UR.
+
+Needs a reachable IBM i host configured through DJANGO_SETTINGS_MODULE, e.g. tests.settings with
+the TEST_SYSTEM_* environment variables set. A scratch table stands in for a busy order file: a
+writer thread keeps updating its rows in transactions that hold their locks for HOLD seconds, while
+the reader sums the table under the default isolation and under each level given:
+
+    PYTHONPATH=src:. DJANGO_SETTINGS_MODULE=tests.settings \
+        python benchmarks/isolation.py [LEVEL ...]
+"""
+import statistics
+import sys
+import threading
+import time
+
+TABLE = 'DJANGO_ISERIES_ISOLATION_BENCH'
+ROWS = 10_000
+HOLD = 0.2
+REPEAT = 10
+
+
+def writer(stop):
+    from django.db import connection, transaction
+
+    try:
+        while not stop.is_set():
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(f'UPDATE {TABLE} SET AMOUNT = AMOUNT + 1 WHERE MOD(ID, 10) = 0')
+                time.sleep(HOLD)
+    finally:
+        connection.close()
+
+
+def timed(cursor, sql):
+    timings = []
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        cursor.execute(sql)
+        cursor.fetchall()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings), max(timings)
+
+
+def main(levels):
+    import django
+    django.setup()
+    from django.db import connection
+
+    with connection.cursor() as cursor:
+        cursor.execute(f'CREATE OR REPLACE TABLE {TABLE} (ID INTEGER NOT NULL PRIMARY KEY, AMOUNT INTEGER NOT NULL)')
+        cursor.executemany(f'INSERT INTO {TABLE} VALUES (%s, 0)', [(i,) for i in range(ROWS)])
+
+    stop = threading.Event()
+    thread = threading.Thread(target=writer, args=(stop,))
+    thread.start()
+    try:
+        time.sleep(HOLD)
+        with connection.cursor() as cursor:
+            for level in [None, *levels]:
+                clause = f' WITH {level}' if level else ''
+                median, worst = timed(cursor, f'SELECT SUM(AMOUNT) FROM {TABLE}{clause}')
+                print(f'{level or "default":<8} median={median * 1000:.1f}ms max={worst * 1000:.1f}ms')
+    finally:
+        stop.set()
+        thread.join()
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE {TABLE}')
+
+
+if __name__ == '__main__':
+    main([arg.upper() for arg in sys.argv[1:]] or ['UR', 'NC', 'CS'])
@@ -0,0 +1,56 @@
+"""
+First-page and deep-page latency of OFFSET/FETCH FIRST slicing against the ROW_NUMBER() fallback.
+
+Needs a reachable IBM i host configured through DJANGO_SETTINGS_MODULE, e.g. tests.settings with
+the TEST_SYSTEM_* environment variables set, and a large table ordered by an indexed column:
+
+    PYTHONPATH=src:. DJANGO_SETTINGS_MODULE=tests.settings \
+        python benchmarks/pagination.py MYLIB.ORDERS ORDER_ID [DEEP_OFFSET]
+"""
+import statistics
+import sys
+import time
+
+PAGE = 20
+REPEAT = 5
+
+
+def page_sql(connection, table, order_column, columns, offset, offset_fetch):
+    from django_iseries.query import row_number_pagination_sql
+
+    qn = connection.ops.quote_name
+    select_list = ', '.join(f'{qn(column)} AS {qn(column)}' for column in columns)
+    sql = f'SELECT {select_list} FROM {table} ORDER BY {qn(order_column)}'
+    if offset_fetch:
+        return f'{sql} {connection.ops.limit_offset_sql(offset, offset + PAGE)}'
+    return row_number_pagination_sql(sql, [qn(column) for column in columns], offset, offset + PAGE, ordered=True)
+
+
+def timed(cursor, sql):
+    timings = []
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        cursor.execute(sql)
+        rows = cursor.fetchall()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings), len(rows)
+
+
+def main(table, order_column, deep_offset=1_000_000):
+    import django
+    django.setup()
+    from django.db import connection
+
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT * FROM {table} FETCH FIRST 1 ROWS ONLY')
+        columns = [description[0] for description in cursor.description]
+        for offset in (0, deep_offset):
+            for offset_fetch in (True, False):
+                sql = page_sql(connection, table, order_column, columns, offset, offset_fetch)
+                elapsed, fetched = timed(cursor, sql)
+                mode = 'offset-fetch' if offset_fetch else 'row-number'
+                print(f'{mode:<12} offset={offset:<9} rows={fetched} median={elapsed * 1000:.1f}ms')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1], sys.argv[2], *(int(arg) for arg in sys.argv[3:]))
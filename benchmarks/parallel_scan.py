@@ -0,0 +1,36 @@
+"""
+Rows per second of a full table scan with parallel_scan() at several worker counts.
+
+Needs a reachable IBM i host configured through DJANGO_SETTINGS_MODULE, e.g. tests.settings with
+the TEST_SYSTEM_* environment variables set, and a model over a large table:
+
+    PYTHONPATH=src:. DJANGO_SETTINGS_MODULE=tests.settings \
+        python benchmarks/parallel_scan.py app_label.ModelName [WORKERS ...]
+"""
+import sys
+import time
+
+
+def main(model_label, worker_counts):
+    import django
+    django.setup()
+    from django.apps import apps
+    from django_iseries.scan import parallel_scan
+
+    model = apps.get_model(model_label)
+    queryset = model.objects.values_list()
+
+    started = time.perf_counter()
+    baseline_rows = sum(1 for _ in queryset.iterator(chunk_size=2000))
+    baseline = time.perf_counter() - started
+    print(f'single query  rows={baseline_rows} time={baseline:.2f}s')
+
+    for workers in worker_counts:
+        started = time.perf_counter()
+        rows = sum(1 for _ in parallel_scan(queryset, workers=workers))
+        elapsed = time.perf_counter() - started
+        print(f'workers={workers:<4} rows={rows} time={elapsed:.2f}s speedup={baseline / elapsed:.1f}x')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1], [int(arg) for arg in sys.argv[2:]] or [1, 2, 4, 8, 16])
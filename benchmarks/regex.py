@@ -0,0 +1,46 @@
+"""
+Rows per second of a regex filter compiled to REGEXP_LIKE and to the XQuery fn:matches() fallback.
+
+Needs a reachable IBM i host configured through DJANGO_SETTINGS_MODULE, e.g. tests.settings with
+the TEST_SYSTEM_* environment variables set, and a large table with a character column:
+
+    PYTHONPATH=src:. DJANGO_SETTINGS_MODULE=tests.settings \
+        python benchmarks/regex.py MYLIB.CUSTOMERS NAME ['^[A-M].*(INC|LTD)$']
+"""
+import statistics
+import sys
+import time
+
+REPEAT = 5
+
+
+def timed(cursor, sql, params):
+    timings = []
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        cursor.execute(sql, params)
+        matched = cursor.fetchone()[0]
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings), matched
+
+
+def main(table, column, pattern='^[A-M].*(INC|LTD)$'):
+    import django
+    django.setup()
+    from django.db import connection
+
+    qn = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT COUNT(*) FROM {table}')
+        rows = cursor.fetchone()[0]
+        for regexp_like in (True, False):
+            connection.features.supports_regexp_like = regexp_like
+            predicate = connection.ops.regex_lookup('iregex') % (qn(column), '%s')
+            elapsed, matched = timed(cursor, f'SELECT COUNT(*) FROM {table} WHERE {predicate}', [pattern])
+            path = 'regexp_like' if regexp_like else 'xquery'
+            print(f'{path:<12} rows={rows} matched={matched} median={elapsed * 1000:.1f}ms '
+                  f'rows/s={rows / elapsed:,.0f}')
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
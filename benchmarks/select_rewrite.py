@@ -0,0 +1,25 @@
+"""
+Microbenchmark: select-clause placeholder scanner versus the former sqlparse implementation.
+
+Run from the repository root (no database connection is needed):
+
+    PYTHONPATH=src:. python benchmarks/select_rewrite.py
+"""
+import timeit
+
+from tests.test_select_rewrite import CORPUS, scanner_select_clause_rewrite, sqlparse_select_clause_rewrite
+
+ORM_SELECT = ('SELECT "TESTS_PERSON"."ID", "TESTS_PERSON"."FIRST_NAME", "TESTS_PERSON"."LAST_NAME" '
+              'FROM "TESTS_PERSON" WHERE ("TESTS_PERSON"."FIRST_NAME" = ? AND "TESTS_PERSON"."ID" IN (?, ?, ?)) '
+              'ORDER BY "TESTS_PERSON"."ID" ASC')
+
+
+def bench(label, queries, number):
+    for name, func in (('sqlparse', sqlparse_select_clause_rewrite), ('scanner', scanner_select_clause_rewrite)):
+        seconds = timeit.timeit(lambda: [func(query) for query in queries], number=number)
+        print(f'{label:<16} {name:<9} {seconds / (number * len(queries)) * 1e6:9.2f} us/statement')
+
+
+if __name__ == '__main__':
+    bench('orm select', [ORM_SELECT], 2000)
+    bench('corpus', CORPUS, 200)
@@ -0,0 +1,67 @@
+"""
+Upsert throughput: bulk_upsert() (one MERGE per batch) against update_or_create() per row.
+
+Half of every run's rows already exist and are updated, the other half are inserted. Needs a reachable
+IBM i host configured through DJANGO_SETTINGS_MODULE, e.g. tests.settings with the TEST_SYSTEM_*
+environment variables set; a scratch table is created and dropped again:
+
+    PYTHONPATH=src:. DJANGO_SETTINGS_MODULE=tests.settings \
+        python benchmarks/upsert.py [ROWS ...]
+"""
+import sys
+import time
+
+TABLE = 'DJANGO_ISERIES_UPSERT_BENCH'
+DEFAULT_ROWS = (1_000, 10_000, 100_000)
+# update_or_create() takes minutes on large runs; it is timed on a sample and extrapolated
+PER_ROW_SAMPLE = 2_000
+
+
+def timed(function, *args):
+    started = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - started
+
+
+def main(sizes):
+    import django
+    django.setup()
+    from django.db import connection, models, transaction
+
+    from django_iseries.upsert import UpsertManager
+
+    class Price(models.Model):
+        sku = models.CharField(max_length=20, unique=True)
+        amount = models.DecimalField(max_digits=11, decimal_places=2)
+        objects = UpsertManager()
+
+        class Meta:
+            app_label = 'tests'
+            db_table = TABLE
+
+    def per_row(prices):
+        with transaction.atomic():
+            for price in prices:
+                Price.objects.update_or_create(sku=price.sku, defaults={'amount': price.amount})
+
+    def merge(prices):
+        with transaction.atomic():
+            Price.objects.bulk_upsert(prices, match_fields=['sku'])
+
+    with connection.schema_editor() as editor:
+        editor.create_model(Price)
+    try:
+        for rows in sizes:
+            for method, upsert, count in (('per row', per_row, min(rows, PER_ROW_SAMPLE)), ('MERGE', merge, rows)):
+                Price.objects.all().delete()
+                Price.objects.bulk_create(Price(sku=f'SKU{i:09d}', amount=1) for i in range(0, count, 2))
+                prices = [Price(sku=f'SKU{i:09d}', amount=2) for i in range(count)]
+                elapsed = timed(upsert, prices) * rows / count
+                print(f'{method:<8} rows={rows:>7} {elapsed:8.2f}s {rows / elapsed:10.0f} rows/s')
+    finally:
+        with connection.schema_editor() as editor:
+            editor.delete_model(Price)
+
+
+if __name__ == '__main__':
+    main([int(rows) for rows in sys.argv[1:]] or DEFAULT_ROWS)
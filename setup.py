@@ -14,8 +14,6 @@ except:
 requirements = [
  'pyodbc>=4.0.27', 
  'django>=2.2.0',
-  
-  'sqlparse',
 
 ]
 
@@ -20,16 +20,19 @@
 DB2 database backend for Django.
 Requires: ibm_db_dbi (http://pypi.python.org/pypi/ibm_db) for python
 """
+from contextlib import contextmanager
 
 from django.core.exceptions import ImproperlyConfigured
 from django.db import utils
 from django.db.backends.base.base import BaseDatabaseWrapper
 from django.db.backends.base.features import BaseDatabaseFeatures
 from django.db.backends.base.validation import BaseDatabaseValidation
+from django.utils.functional import cached_property
 
 # Importing internal classes from iseries package.
 from django_iseries.pybase import DatabaseWrapper as PyBaseDatabaseWrapper
 from django_iseries.client import DatabaseClient
+from django_iseries.compiler import compiled_sql_cache, in_list_stats
 from django_iseries.creation import DatabaseCreation
 from django_iseries.introspection import DatabaseIntrospection
 from django_iseries.operations import DatabaseOperations
@@ -38,6 +41,12 @@ from . import Database
 
 dbms_name = 'dbname'
 
+# First release where every TR supports OFFSET n ROWS / FETCH FIRST m ROWS ONLY
+OFFSET_FETCH_MIN_VERSION = (7, 3)
+# REGEXP_LIKE (needs the International Components for Unicode option of the OS)
+REGEXP_LIKE_MIN_VERSION = (7, 1)
+TRUNC_TIMESTAMP_MIN_VERSION = (7, 1)
+
 
 class DatabaseFeatures(BaseDatabaseFeatures):
     allows_group_by_pk = False
@@ -48,6 +57,11 @@ class DatabaseFeatures(BaseDatabaseFeatures):
     can_use_chunked_reads = True
     can_return_id_from_insert = True
     can_return_ids_from_bulk_insert = True
+    can_return_columns_from_insert = True
+    can_return_rows_from_bulk_insert = True
+    # bulk_create(update_conflicts=True) compiles to MERGE, matched on the unique fields
+    supports_update_conflicts = True
+    supports_update_conflicts_with_target = True
     uses_savepoints = True
     can_release_savepoints = True
 
@@ -102,6 +116,47 @@ class DatabaseFeatures(BaseDatabaseFeatures):
     create_test_procedure_without_params_sql = None
     create_test_procedure_with_int_param_sql = None
 
+    @cached_property
+    def supports_offset_fetch(self):
+        """
+        Slice with OFFSET/FETCH FIRST, or with the ROW_NUMBER() fallback on older releases.
+        The 'PAGINATION' database setting ('OFFSET_FETCH' or 'ROW_NUMBER') skips release detection.
+        """
+        pagination = self.connection.settings_dict.get('PAGINATION')
+        if pagination:
+            return pagination.upper() == 'OFFSET_FETCH'
+        return self.connection.get_server_version() >= OFFSET_FETCH_MIN_VERSION
+
+    @cached_property
+    def supports_regexp_like(self):
+        """
+        Compile __regex/__iregex to REGEXP_LIKE, or to the XQuery fn:matches() fallback on older
+        releases. The 'REGEX' database setting ('REGEXP_LIKE' or 'XQUERY') skips release detection.
+        """
+        regex = self.connection.settings_dict.get('REGEX')
+        if regex:
+            return regex.upper() == 'REGEXP_LIKE'
+        return self.connection.get_server_version() >= REGEXP_LIKE_MIN_VERSION
+
+    @cached_property
+    def supports_bulk_update_merge(self):
+        """
+        Run bulk_update() batches as one MERGE against a VALUES table instead of Django's
+        CASE WHEN chains; the 'BULK_UPDATE' database setting ('MERGE' or 'CASE') picks one.
+        """
+        return self.connection.settings_dict.get('BULK_UPDATE', 'MERGE').upper() == 'MERGE'
+
+    @cached_property
+    def supports_trunc_timestamp(self):
+        """
+        Truncate dates and timestamps with TRUNC_TIMESTAMP, or with date arithmetic on older releases.
+        The 'TRUNC' database setting ('TRUNC_TIMESTAMP' or 'ARITHMETIC') skips release detection.
+        """
+        trunc = self.connection.settings_dict.get('TRUNC')
+        if trunc:
+            return trunc.upper() == 'TRUNC_TIMESTAMP'
+        return self.connection.get_server_version() >= TRUNC_TIMESTAMP_MIN_VERSION
+
 
 class DatabaseValidation(BaseDatabaseValidation):
     # Need to do validation for DB2 and ibm_db version
@@ -172,7 +227,9 @@ class DatabaseWrapper(BaseDatabaseWrapper):
 
         self.introspection = DatabaseIntrospection(self)
         self.validation = DatabaseValidation(self)
-        self.databaseWrapper = PyBaseDatabaseWrapper()
+        self.databaseWrapper = PyBaseDatabaseWrapper(self.settings_dict)
+        # IN lists staged in QTEMP by the statement being executed (see django_iseries.staging)
+        self.key_staging = None
 
     # Method to check if connection is live or not.
     def __is_connection(self):
@@ -241,6 +298,12 @@ class DatabaseWrapper(BaseDatabaseWrapper):
             if isinstance(database_sslclientkeystash, str):
                 kwargs['sslclientkeystash'] = database_sslclientkeystash
 
+        if 'INIT_SCRIPT' in settings_dict:
+            kwargs['init_script'] = list(settings_dict['INIT_SCRIPT'])
+
+        if 'BLOCKSIZE' in settings_dict:
+            kwargs['blocksize'] = settings_dict['BLOCKSIZE']
+
         if 'SSLSERVERCERTIFICATE' in settings_dict:
             database_sslservercertificate = settings_dict['SSLSERVERCERTIFICATE']
             if isinstance(database_sslservercertificate, str):
@@ -256,11 +319,53 @@ class DatabaseWrapper(BaseDatabaseWrapper):
     # Over-riding _cursor method to return DB2 cursor.
 
     def create_cursor(self, name=None):
-        return self.databaseWrapper._cursor(self.connection)
+        return self.databaseWrapper._cursor(self.connection, name)
+
+    def chunked_cursor(self):
+        """Cursor for QuerySet.iterator(); fetches at most one block of rows at a time."""
+        return self._cursor(name='stream')
 
     def init_connection_state(self):
         pass
 
+    @contextmanager
+    def zero_copy_rows(self, enabled=True):
+        """
+        Fetch pyodbc rows without copying them into tuples for querysets run inside the block:
+
+            with connection.zero_copy_rows():
+                for obj in queryset.iterator():
+                    ...
+
+        pyodbc.Row supports indexing, slicing and unpacking, which is all model and values()
+        iteration needs, but it does not compare equal to a tuple nor hash; values_list(), raw
+        cursors and the backend's own fetches keep getting tuples.
+        """
+        previous = self.databaseWrapper.zero_copy_rows
+        self.databaseWrapper.zero_copy_rows = enabled
+        try:
+            yield
+        finally:
+            self.databaseWrapper.zero_copy_rows = previous
+
+    def prewarm_pool(self):
+        """
+        Open the 'POOL' MIN_SIZE connections in parallel, e.g. from a prefork server's post_fork hook,
+        so the first requests do not pay for host server sign-on. Returns the opening threads.
+        """
+        return self.databaseWrapper.prewarm_pool(self.get_connection_params())
+
+    def compiled_sql_cache_stats(self):
+        cache = compiled_sql_cache(self)
+        return cache.stats() if cache is not None else None
+
+    def in_list_stats(self):
+        """Process-wide counts of bucketed IN lists and of the statement texts bucketing saved"""
+        return in_list_stats.stats()
+
+    def pool_stats(self):
+        return self.databaseWrapper.pool_stats()
+
     def is_usable(self):
         if self.databaseWrapper.is_active(self.connection):
             return True
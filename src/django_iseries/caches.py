@@ -0,0 +1,77 @@
+"""
+Small bounded caches shared by the cursor, compiler and connection layers.
+"""
+
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    Bounded, thread-safe least-recently-used mapping.
+
+    Hits, misses and evictions are counted so callers can expose them through ``stats()``.
+    ``on_evict`` is called with every value pushed out of the cache (outside the lock), which
+    lets owners release resources held by cached values.
+    """
+
+    def __init__(self, maxsize=512, on_evict=None):
+        self.maxsize = maxsize
+        self.on_evict = on_evict
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        evicted = []
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                evicted.append(self._data.popitem(last=False)[1])
+                self.evictions += 1
+        if self.on_evict is not None:
+            for value in evicted:
+                self.on_evict(value)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            return self._data.pop(key, default)
+
+    def clear(self):
+        with self._lock:
+            values = list(self._data.values())
+            self._data.clear()
+        if self.on_evict is not None:
+            for value in values:
+                self.on_evict(value)
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+        }
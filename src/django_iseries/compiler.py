@@ -16,19 +16,533 @@
 # | Authors: Ambrish Bhargava, Tarun Pasrija, Rahul Priyadarshi              |
 # +--------------------------------------------------------------------------+
 
+import contextlib
+import datetime
+import decimal
 import sys
+import threading
 
+from django.core.exceptions import EmptyResultSet, FullResultSet, ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.conf import settings
+from django.db import DatabaseError, NotSupportedError
+from django.db.models import DateTimeField
+from django.db.models.expressions import Case, Col, Value
+from django.db.models.functions import ExtractYear, TruncDate
+from django.db.models.lookups import Exact, GreaterThan, GreaterThanOrEqual, In, LessThan, LessThanOrEqual, Lookup, Range
+from django.db.models.signals import post_migrate
 from django.db.models.sql import compiler
+from django.db.models.constants import OnConflict
+from django.db.models.sql.constants import GET_ITERATOR_CHUNK_SIZE, MULTI
+from django.db.models.sql.where import WhereNode
 
 from itertools import zip_longest
 
+from django_iseries.caches import LRUCache
+from django_iseries.query import row_number_pagination_sql
+from django_iseries.staging import KeyStaging, staged_in_sql, staging_threshold
+
+# Compiled SELECT templates per database alias, for connections with COMPILED_SQL_CACHE_SIZE set.
+# Query shapes that cannot be cached are remembered as UNCACHEABLE so they are only compiled once more.
+compiled_sql_caches = {}
+compiled_sql_caches_lock = threading.Lock()
+UNCACHEABLE = object()
+
+
+class Uncacheable(Exception):
+    pass
+
+
+class CompiledSQLCache(LRUCache):
+    def __init__(self, maxsize):
+        super().__init__(maxsize)
+        # compilations of query shapes the cache cannot hold
+        self.uncacheable = 0
+
+    def stats(self):
+        return dict(super().stats(), uncacheable=self.uncacheable)
+
+
+def compiled_sql_cache(connection):
+    maxsize = int(connection.settings_dict.get('COMPILED_SQL_CACHE_SIZE', 0))
+    if maxsize <= 0:
+        return None
+    with compiled_sql_caches_lock:
+        cache = compiled_sql_caches.get(connection.alias)
+        if cache is None:
+            cache = compiled_sql_caches[connection.alias] = CompiledSQLCache(maxsize)
+        return cache
+
+
+def clear_compiled_sql_caches(**kwargs):
+    """Models or settings changed: compiled statements may no longer match them"""
+    with compiled_sql_caches_lock:
+        for cache in compiled_sql_caches.values():
+            cache.clear()
+
+
+post_migrate.connect(clear_compiled_sql_caches)
+setting_changed.connect(clear_compiled_sql_caches)
+
+
+# IN list sizes used with 'IN_LIST_BUCKETS': True. Longer lists are split into OR'ed groups.
+DEFAULT_IN_LIST_BUCKETS = tuple(2 ** power for power in range(11))
+
+
+def in_list_buckets(connection):
+    buckets = connection.settings_dict.get('IN_LIST_BUCKETS')
+    if not buckets:
+        return None
+    if buckets is True:
+        return DEFAULT_IN_LIST_BUCKETS
+    return tuple(sorted(buckets))
+
+
+# Statement texts InListStats remembers, most recently compiled first, of each kind
+IN_LIST_STATS_TEXTS = 1024
+
+
+class InListStats:
+    """
+    Distinct IN list statement texts with and without bucketing, per compiled column, among the
+    most recently compiled ones.
+    """
+
+    def __init__(self, maxsize=IN_LIST_STATS_TEXTS):
+        self.maxsize = maxsize
+        self.lists = 0
+        self.padded_values = 0
+        self.split_lists = 0
+        self._texts = LRUCache(maxsize)
+        self._bucketed_texts = LRUCache(maxsize)
+        self._lock = threading.Lock()
+
+    def record(self, lhs_sql, count, sizes):
+        with self._lock:
+            self.lists += 1
+            self.padded_values += sum(sizes) - count
+            self.split_lists += len(sizes) > 1
+        self._texts.put((lhs_sql, count), True)
+        self._bucketed_texts.put((lhs_sql, sizes), True)
+
+    def stats(self):
+        return {
+            'lists': self.lists,
+            'padded_values': self.padded_values,
+            'split_lists': self.split_lists,
+            'texts': len(self._texts),
+            'bucketed_texts': len(self._bucketed_texts),
+            'texts_saved': len(self._texts) - len(self._bucketed_texts),
+        }
+
+    def clear(self):
+        with self._lock:
+            self.lists = self.padded_values = self.split_lists = 0
+        self._texts.clear()
+        self._bucketed_texts.clear()
+
+
+in_list_stats = InListStats()
+
+
+def clear_in_list_stats(**kwargs):
+    in_list_stats.clear()
+
+
+setting_changed.connect(clear_in_list_stats)
+
+
+def bucketed_in_sql(compiler, node, buckets, record=True):
+    """
+    (sql, params) of an IN lookup over plain values with the list padded to the next bucket size by
+    repeating its last value, so lists of similar length share one statement text (and plan cache and
+    package entry). Lists longer than the largest bucket become OR'ed IN lists of bucket sizes.
+    None when the lookup is not a column compared with a plain value list.
+    """
+    if not isinstance(node.lhs, Col) or not node.rhs_is_direct_value():
+        return None
+    rhs_sql, values = node.process_rhs(compiler, compiler.connection)
+    if rhs_sql != '(%s)' % ', '.join(['%s'] * len(values)):
+        return None
+    lhs_sql, lhs_params = node.process_lhs(compiler, compiler.connection)
+
+    largest = buckets[-1]
+    values = list(values)
+    sqls, params, sizes = [], [], []
+    for start in range(0, len(values), largest):
+        group = values[start:start + largest]
+        size = next(bucket for bucket in buckets if bucket >= len(group))
+        group.extend([group[-1]] * (size - len(group)))
+        sqls.append('%s IN (%s)' % (lhs_sql, ', '.join(['%s'] * size)))
+        params.extend(lhs_params)
+        params.extend(group)
+        sizes.append(size)
+    if record:
+        in_list_stats.record(lhs_sql, len(values), tuple(sizes))
+    if len(sqls) == 1:
+        return sqls[0], params
+    return '(%s)' % ' OR '.join(sqls), params
+
+
+# Comparisons of a date or year with the [start, end) bounds of the period, for sargable_date_sql()
+PERIOD_COMPARISONS = (
+    (Exact, '({column} >= %s AND {column} < %s)', ('start', 'end')),
+    (GreaterThanOrEqual, '{column} >= %s', ('start',)),
+    (GreaterThan, '{column} >= %s', ('end',)),
+    (LessThanOrEqual, '{column} < %s', ('end',)),
+    (LessThan, '{column} < %s', ('start',)),
+)
+
+
+def period_bounds(transform, value):
+    """[start, end) dates of the day (TruncDate) or year (ExtractYear) ``value`` names, or None"""
+    if isinstance(transform, TruncDate):
+        if not isinstance(value, datetime.date) or value >= datetime.date.max:
+            return None
+        value = value.date() if isinstance(value, datetime.datetime) else value
+        return value, value + datetime.timedelta(days=1)
+    if isinstance(value, bool) or not isinstance(value, int) or not 1 <= value < 9999:
+        return None
+    return datetime.date(value, 1, 1), datetime.date(value + 1, 1, 1)
+
+
+def sargable_date_sql(compiler, node):
+    """
+    (sql, params) comparing a bare date or timestamp column with the bounds of a date or year, for
+    ``col__date`` and ``col__year`` filters on plain values: ``YEAR(col) = 2025`` becomes
+    ``col >= '2025-01-01' AND col < '2026-01-01'``, which can use an index on the column.
+    None when the filter cannot be rewritten.
+    """
+    transform = node.lhs
+    column = transform.lhs
+    if not isinstance(column, Col) or not node.rhs_is_direct_value():
+        return None
+    if isinstance(column.output_field, DateTimeField):
+        if settings.USE_TZ and transform.get_tzname() != compiler.connection.timezone_name:
+            return None
+        adapt = compiler.connection.ops.adapt_datetimefield_value
+        as_column_value = lambda date: adapt(datetime.datetime.combine(date, datetime.time.min))
+    else:
+        as_column_value = compiler.connection.ops.adapt_datefield_value
+
+    if isinstance(node, Range):
+        values = list(node.rhs)
+        template, bounds = '({column} >= %s AND {column} < %s)', ('start', 'end')
+    else:
+        for lookup_class, template, bounds in PERIOD_COMPARISONS:
+            if isinstance(node, lookup_class):
+                values = [node.rhs] * len(bounds)
+                break
+        else:
+            return None
+    params = []
+    for value, bound in zip(values, bounds):
+        if hasattr(value, 'resolve_expression'):
+            return None
+        period = period_bounds(transform, value)
+        if period is None:
+            return None
+        params.append(as_column_value(period[0] if bound == 'start' else period[1]))
+
+    column_sql, column_params = compiler.compile(column)
+    if column_params:
+        return None
+    return template.format(column=column_sql), params
+
+
+# Statement level isolation clauses: WITH NC, UR, CS, RS or RR after the rest of a SELECT statement
+ISOLATION_LEVELS = ('NC', 'UR', 'CS', 'RS', 'RR')
+SKIP_LOCKED_DATA = ' SKIP LOCKED DATA'
+
+
+class _Nesting(threading.local):
+    depth = 0
+
+
+_nesting = _Nesting()
+
+
+@contextlib.contextmanager
+def compiling():
+    """Yield whether this is the outermost compilation of the thread (not a subquery or union part)"""
+    _nesting.depth += 1
+    try:
+        yield _nesting.depth == 1
+    finally:
+        _nesting.depth -= 1
+
+
+def isolation_level(level):
+    level = level.upper()
+    if level not in ISOLATION_LEVELS:
+        raise ValueError(f'Isolation level must be one of {", ".join(ISOLATION_LEVELS)}, not {level!r}')
+    return level
+
+
+def isolation_sql(compiler, query, sql):
+    """
+    Add the isolation clause of ``query`` (set by with_isolation()), or the 'ISOLATION' database
+    setting, to a SELECT statement. The clause goes before SKIP LOCKED DATA, and the default is
+    not applied to select_for_update() when it is NC or UR, which cannot lock rows.
+    """
+    level = getattr(query, 'isolation', None)
+    explicit = level is not None
+    if not explicit:
+        level = compiler.connection.settings_dict.get('ISOLATION')
+        if not level:
+            return sql
+        try:
+            level = isolation_level(level)
+        except ValueError as e:
+            raise ImproperlyConfigured(f"'ISOLATION' database setting: {e}")
+    if query.select_for_update and level in ('NC', 'UR'):
+        if explicit:
+            raise NotSupportedError(f'select_for_update() cannot be used with isolation level {level}')
+        return sql
+    return statement_clause_sql(sql, f'WITH {level}')
+
+
+def optimize_for_sql(compiler, query, sql, chunk_size=None):
+    """
+    Add OPTIMIZE FOR n ROWS to a SELECT statement: n is set by optimize_for(), or else the size of
+    a slice sliced with the ROW_NUMBER() fallback (FETCH FIRST implies it), or else the chunk size
+    of a QuerySet.iterator() fetch.
+    """
+    rows = getattr(query, 'optimize_rows', None)
+    if rows is None:
+        if query.high_mark is not None and not compiler.connection.features.supports_offset_fetch:
+            rows = query.high_mark - query.low_mark
+        elif not query.is_sliced:
+            rows = chunk_size
+    if not rows:
+        return sql
+    return statement_clause_sql(sql, f'OPTIMIZE FOR {rows:d} ROWS')
+
+
+def statement_clause_sql(sql, clause):
+    """Append a statement clause, ahead of a trailing SKIP LOCKED DATA"""
+    if sql.endswith(SKIP_LOCKED_DATA):
+        return f'{sql[:-len(SKIP_LOCKED_DATA)]} {clause}{SKIP_LOCKED_DATA}'
+    return f'{sql} {clause}'
+
+
+def typed_values_sql(connection, fields, placeholder_rows):
+    """
+    Rows of a VALUES table constructor, every marker CAST to its field's type: untyped markers in
+    VALUES have no data type to resolve to
+    """
+    types = [field.cast_db_type(connection) for field in fields]
+    return ', '.join(
+        '(%s)' % ', '.join(f'CAST({placeholder} AS {type_})' for placeholder, type_ in zip(placeholders, types))
+        for placeholders in placeholder_rows
+    )
+
+
+def merge_key(fields, values):
+    """
+    Hashable key of match column values, equal for a bound value and the value read back: both go
+    through the field's to_python() and are cut to what the column stores (no trailing CHAR blanks,
+    TIME without fractional seconds, DECIMAL truncated to its scale).
+    """
+    key = []
+    for field, value in zip(fields, values):
+        if value is not None:
+            value = field.to_python(value)
+        if isinstance(value, str):
+            value = value.rstrip()
+        elif isinstance(value, datetime.time):
+            value = value.replace(microsecond=0)
+        elif isinstance(value, decimal.Decimal) and value.is_finite() and hasattr(field, 'decimal_places'):
+            exponent = decimal.Decimal(1).scaleb(-field.decimal_places)
+            value = value.quantize(exponent, rounding=decimal.ROUND_DOWN)
+        key.append(value)
+    return tuple(key)
+
+
+class CompiledSelect:
+    """SQL template of a query shape plus the compiler state Django reads after as_sql()"""
+
+    def __init__(self, compiler, sql):
+        self.sql = sql
+        self.select = compiler.select
+        self.klass_info = compiler.klass_info
+        self.annotation_col_map = compiler.annotation_col_map
+        self.col_count = compiler.col_count
+        self.has_extra_select = compiler.has_extra_select
+
+    def restore(self, compiler):
+        compiler.select = self.select
+        compiler.klass_info = self.klass_info
+        compiler.annotation_col_map = self.annotation_col_map
+        compiler.col_count = self.col_count
+        compiler.has_extra_select = self.has_extra_select
+
+
+def query_fingerprint(compiler, with_limits, with_col_aliases):
+    """
+    Key identifying everything the SQL of a plain select depends on, and its params in SQL order.
+    Only filters comparing a column with plain values are understood; anything else (annotations,
+    subqueries, expressions, extra(), ...) raises Uncacheable.
+    """
+    query = compiler.query
+    if (query.annotations or query.extra or query.extra_tables or query.group_by is not None
+            or query.combinator or query.subquery or query.explain_info):
+        raise Uncacheable
+    if not all(isinstance(item, str) for item in query.order_by):
+        raise Uncacheable
+    select = []
+    for col in query.select:
+        if not isinstance(col, Col):
+            raise Uncacheable
+        select.append((col.alias, col.target))
+    joins = []
+    for alias, join in query.alias_map.items():
+        if getattr(join, 'filtered_relation', None) is not None:
+            raise Uncacheable
+        joins.append((alias, join.identity, getattr(join, 'join_type', None), getattr(join, 'nullable', None)))
+
+    params = []
+    where = where_fingerprint(query.where, compiler, params)
+    key = (
+        compiler.connection.alias, compiler.connection.features.supports_offset_fetch,
+        query.model, with_limits, with_col_aliases, tuple(select), tuple(joins), where,
+        query.default_cols, query.values_select, getattr(query, 'selected', None) and tuple(query.selected),
+        query.deferred_loading[0] and frozenset(query.deferred_loading[0]), query.deferred_loading[1],
+        repr(query.select_related), query.max_depth,
+        tuple(query.order_by), tuple(query.extra_order_by), query.default_ordering, query.standard_ordering,
+        query.low_mark, query.high_mark, query.distinct, tuple(query.distinct_fields),
+        query.select_for_update, query.select_for_update_nowait, query.select_for_update_skip_locked,
+        tuple(query.select_for_update_of), query.select_for_no_key_update,
+    )
+    try:
+        hash(key)
+    except TypeError:
+        raise Uncacheable
+    return key, params
+
+
+def where_fingerprint(node, compiler, params):
+    if isinstance(node, WhereNode):
+        return node.connector, node.negated, tuple(where_fingerprint(child, compiler, params) for child in node.children)
+    if (not isinstance(node, Lookup) or not isinstance(node.lhs, Col)
+            or hasattr(node.rhs, 'resolve_expression') or not node.rhs_is_direct_value()):
+        raise Uncacheable
+    if isinstance(node, In) and len(node.rhs) > (staging_threshold(compiler.connection) or float('inf')):
+        # staged key sets are loaded while compiling, which a cached statement would skip
+        raise Uncacheable
+    try:
+        bucketed = None
+        buckets = in_list_buckets(compiler.connection) if isinstance(node, In) else None
+        if buckets:
+            bucketed = bucketed_in_sql(compiler, node, buckets, record=False)
+        if bucketed is not None:
+            rhs_sql, rhs_params = bucketed
+        else:
+            rhs_sql, rhs_params = node.process_rhs(compiler, compiler.connection)
+    except (EmptyResultSet, FullResultSet):
+        raise Uncacheable
+    params.extend(rhs_params)
+    return type(node), node.lhs.alias, node.lhs.target, type(node.rhs), rhs_sql
+
 
 class SQLCompiler(compiler.SQLCompiler):
-    def as_sql(self):
+    def as_sql(self, with_limits=True, with_col_aliases=False):
+        with compiling() as outermost:
+            sql, params = self.cached_as_sql(with_limits, with_col_aliases)
+        if outermost and not self.query.subquery:
+            sql = optimize_for_sql(self, self.query, sql, getattr(self, 'fetch_chunk_size', None))
+            sql = isolation_sql(self, self.query, sql)
+        return sql, params
+
+    def results_iter(self, results=None, tuple_expected=False, chunked_fetch=False,
+                     chunk_size=GET_ITERATOR_CHUNK_SIZE):
+        self.tuple_expected = tuple_expected
+        return super().results_iter(results, tuple_expected, chunked_fetch, chunk_size)
+
+    def execute_sql(self, result_type=MULTI, chunked_fetch=False, chunk_size=GET_ITERATOR_CHUNK_SIZE):
+        # QuerySet.iterator() fetches chunk_size rows at a time: tell the optimizer
+        self.fetch_chunk_size = chunk_size if chunked_fetch else None
+        # rows of models and values() are only indexed and may stay pyodbc rows (ZERO_COPY_ROWS);
+        # values_list() hands its rows out, so they have to compare and hash like tuples
+        wrapper = self.connection.databaseWrapper
+        zero_copy_statement = wrapper.zero_copy_statement
+        wrapper.zero_copy_statement = result_type == MULTI and not getattr(self, 'tuple_expected', False)
+        try:
+            return self.staged_execute_sql(result_type, chunked_fetch, chunk_size)
+        finally:
+            wrapper.zero_copy_statement = zero_copy_statement
+
+    def staged_execute_sql(self, result_type, chunked_fetch, chunk_size):
+        if self.connection.key_staging is not None:
+            return super().execute_sql(result_type, chunked_fetch, chunk_size)
+        # IN lists over the staging threshold compiled for this statement are loaded into QTEMP
+        staging = self.connection.key_staging = KeyStaging(self.connection)
+        try:
+            result = super().execute_sql(result_type, chunked_fetch, chunk_size)
+        except BaseException:
+            self.connection.key_staging = None
+            staging.drop()
+            raise
+        self.connection.key_staging = None
+        if not staging.tables:
+            return result
+        if result_type == MULTI and chunked_fetch and result is not None:
+            return staging.drop_after(result)
+        staging.drop()
+        return result
+
+    def cached_as_sql(self, with_limits=True, with_col_aliases=False):
+        """
+        Compile with the COMPILED_SQL_CACHE_SIZE cache: a query shape seen before only has its params
+        collected from the WHERE tree, and skips Django's compilation and the rewrites below.
+        """
+        cache = compiled_sql_cache(self.connection) if type(self) is SQLCompiler else None
+        if cache is None:
+            return self.compile_sql(with_limits, with_col_aliases)
+        try:
+            key, params = query_fingerprint(self, with_limits, with_col_aliases)
+            compiled = cache.get(key)
+            if compiled is UNCACHEABLE:
+                raise Uncacheable
+        except Uncacheable:
+            cache.uncacheable += 1
+            return self.compile_sql(with_limits, with_col_aliases)
+        if compiled is not None:
+            compiled.restore(self)
+            return compiled.sql, tuple(params)
+
+        sql, compiled_params = self.compile_sql(with_limits, with_col_aliases)
+        # only trust the fingerprint's params when they are exactly what compilation bound
+        if list(compiled_params) == params:
+            cache.put(key, CompiledSelect(self, sql))
+        else:
+            cache.put(key, UNCACHEABLE)
+        return sql, compiled_params
+
+    def compile(self, node):
+        if isinstance(node, Lookup) and isinstance(node.lhs, (TruncDate, ExtractYear)):
+            compiled = sargable_date_sql(self, node)
+            if compiled is not None:
+                return compiled
+        if isinstance(node, In):
+            compiled = staged_in_sql(self, node)
+            if compiled is not None:
+                return compiled
+            buckets = in_list_buckets(self.connection)
+            if buckets:
+                compiled = bucketed_in_sql(self, node, buckets)
+                if compiled is not None:
+                    return compiled
+        return super().compile(node)
+
+    def compile_sql(self, with_limits=True, with_col_aliases=False):
         """Support returning identity val with single query."""
         """ Sumit here goes the select * from """
 
-        sql, params, *_ = super().as_sql()
+        if with_limits and self.query.is_sliced and not self.connection.features.supports_offset_fetch:
+            sql, params = self.row_number_as_sql()
+        else:
+            sql, params, *_ = super().as_sql(with_limits, with_col_aliases)
 
         original_string = f'"{self.query.base_table}"."RRN()"'
         new_string = f"RRN({self.query.base_table})"
@@ -36,20 +550,172 @@ class SQLCompiler(compiler.SQLCompiler):
 
         return (sql, params)
 
+    def row_number_as_sql(self):
+        sql, params = super().as_sql(with_limits=False, with_col_aliases=True)
+        qn = self.connection.ops.quote_name
+        columns = [qn(alias) for _, _, alias in self.select[:self.col_count]]
+        sql = row_number_pagination_sql(
+            sql, columns, self.query.low_mark, self.query.high_mark, ordered=bool(self.get_order_by())
+        )
+        return sql, params
+
 
 class SQLInsertCompiler(compiler.SQLInsertCompiler, SQLCompiler):
     def as_sql(self):
         """Support returning identity val with single query."""
-        (sql, params), *_ = super().as_sql()
-        qn = self.connection.ops.quote_name
+        if self.query.on_conflict == OnConflict.UPDATE and self.merge_key_fields():
+            return [self.merge_as_sql()]
+        # the returning clause is the SELECT ... FROM FINAL TABLE around the statement, and only
+        # there when values are asked for: it makes the host build and send a result set
+        returning_fields, self.returning_fields = self.returning_fields, None
+        try:
+            (sql, params), *_ = super().as_sql()
+        finally:
+            self.returning_fields = returning_fields
+        self.returning_params = ()
+        if not returning_fields:
+            return [(sql, params)]
         opts = self.query.get_meta()
-        pk_column = qn(opts.pk.column)
-        if str(opts.pk.column).upper() == "RRN()":
-            pk_column = f"RRN({opts.db_table})"
-       
-        sql = f'SELECT {pk_column} FROM FINAL TABLE ({sql}) as {opts.db_table}'
+        sql = f'SELECT {self.returning_columns(returning_fields)} FROM FINAL TABLE ({sql}) as {opts.db_table}'
+        if len(self.query.objs) > 1:
+            sql += ' ORDER BY INPUT SEQUENCE'
         return [(sql, params)]
 
+    def returning_columns(self, fields):
+        qn = self.connection.ops.quote_name
+        columns = []
+        for field in fields:
+            if str(field.column).upper() == "RRN()":
+                columns.append(f"RRN({self.query.get_meta().db_table})")
+            else:
+                columns.append(qn(field.column))
+        return ', '.join(columns)
+
+    def merge_key_fields(self):
+        """
+        Fields of the conflict target; None when one of them is not inserted (e.g. a generated pk),
+        as such rows cannot match anything and are plain inserts.
+        """
+        fields = list(self.query.unique_fields or ())
+        if not fields or any(field not in self.query.fields for field in fields):
+            return None
+        return fields
+
+    def merge_as_sql(self):
+        """
+        One MERGE of the batch against a VALUES table: rows matching the key fields are updated, the
+        others inserted. Returning fields, followed by the key columns the rows are put back in
+        input order with, come from a SELECT ... FROM FINAL TABLE around it.
+        """
+        qn = self.connection.ops.quote_name
+        opts = self.query.get_meta()
+        fields = self.query.fields
+        key_fields = self.merge_key_fields()
+        value_rows = [
+            [self.prepare_value(field, self.pre_save_val(field, obj)) for field in fields]
+            for obj in self.query.objs
+        ]
+        placeholder_rows, param_rows = self.assemble_as_sql(fields, value_rows)
+        rows = typed_values_sql(self.connection, fields, placeholder_rows)
+        columns = [qn(field.column) for field in fields]
+        on = ' AND '.join(f'T.{qn(field.column)} = S.{qn(field.column)}' for field in key_fields)
+        sql = (
+            f'MERGE INTO {qn(opts.db_table)} AS T USING (VALUES {rows}) AS S ({", ".join(columns)}) ON {on}'
+        )
+        if self.query.update_fields:
+            assignments = ', '.join(
+                f'{qn(field.column)} = S.{qn(field.column)}' for field in self.query.update_fields
+            )
+            sql += f' WHEN MATCHED THEN UPDATE SET {assignments}'
+        sql += (
+            f' WHEN NOT MATCHED THEN INSERT ({", ".join(columns)}) '
+            f'VALUES ({", ".join(f"S.{column}" for column in columns)})'
+        )
+        self.returning_params = ()
+        self.merge_keys = [
+            merge_key(key_fields, [row[fields.index(field)] for field in key_fields]) for row in value_rows
+        ]
+        if self.returning_fields:
+            returning = self.returning_columns([*self.returning_fields, *key_fields])
+            sql = f'SELECT {returning} FROM FINAL TABLE ({sql}) as {opts.db_table}'
+        return sql, [param for params in param_rows for param in params]
+
+    def execute_sql(self, returning_fields=None):
+        """Insert rows that nothing is returned for with executemany when the cost model prefers it"""
+        if self.query.on_conflict == OnConflict.UPDATE and returning_fields and self.merge_key_fields():
+            return self.execute_merge(returning_fields)
+        if returning_fields:
+            fetched = self.fetched_returning_fields(returning_fields)
+            if len(fetched) < len(returning_fields):
+                rows = self.execute_sql(fetched) or [()] * len(self.query.objs)
+                return [
+                    self.returning_row(obj, returning_fields, fetched, row)
+                    for obj, row in zip(self.query.objs, rows)
+                ]
+        if not returning_fields and self.query.fields and not self.query.on_conflict:
+            if self.connection.ops.use_executemany_for_insert(len(self.query.objs)):
+                executemany = self.executemany_sql()
+                if executemany is not None:
+                    with self.connection.cursor() as cursor:
+                        cursor.executemany(*executemany)
+                    return []
+        return super().execute_sql(returning_fields)
+
+    def fetched_returning_fields(self, returning_fields):
+        """
+        Returning fields whose values have to be read back: not the ones inserted as plain values
+        (e.g. a client supplied pk).
+        """
+        return [
+            field for field in returning_fields
+            if field not in self.query.fields
+            or any(hasattr(getattr(obj, field.attname), 'resolve_expression') for obj in self.query.objs)
+        ]
+
+    @staticmethod
+    def returning_row(obj, returning_fields, fetched, row):
+        values = dict(zip(fetched, row))
+        return tuple(values[field] if field in values else getattr(obj, field.attname) for field in returning_fields)
+
+    def execute_merge(self, returning_fields):
+        """Returning rows of a MERGE, which has no INPUT SEQUENCE, put back in input order by key"""
+        opts = self.query.get_meta()
+        self.returning_fields = returning_fields
+        with self.connection.cursor() as cursor:
+            for sql, params in self.as_sql():
+                cursor.execute(sql, params)
+            fetched = cursor.fetchall()
+        count = len(returning_fields)
+        key_fields = self.merge_key_fields()
+        by_key = {merge_key(key_fields, row[count:]): tuple(row[:count]) for row in fetched}
+        try:
+            rows = [by_key[key] for key in self.merge_keys]
+        except KeyError as e:
+            raise DatabaseError(f'MERGE returned no row for key {e.args[0]!r} of {opts.db_table}') from None
+        cols = [field.get_col(opts.db_table) for field in returning_fields]
+        converters = self.get_converters(cols)
+        if converters:
+            rows = self.apply_converters(rows, converters)
+        return list(rows)
+
+    def executemany_sql(self):
+        """(single-row INSERT, param rows) of the objects, or None when a value needs its own SQL"""
+        qn = self.connection.ops.quote_name
+        fields = self.query.fields
+        value_rows = [
+            [self.prepare_value(field, self.pre_save_val(field, obj)) for field in fields]
+            for obj in self.query.objs
+        ]
+        placeholder_rows, param_rows = self.assemble_as_sql(fields, value_rows)
+        if any(placeholders != placeholder_rows[0] for placeholders in placeholder_rows):
+            return None
+        sql = 'INSERT INTO %s (%s) VALUES (%s)' % (
+            qn(self.query.get_meta().db_table),
+            ', '.join(qn(field.column) for field in fields),
+            ', '.join(placeholder_rows[0]),
+        )
+        return sql, param_rows
+
 
 class SQLDeleteCompiler(compiler.SQLDeleteCompiler, SQLCompiler):
     def as_sql(self):
@@ -71,6 +737,10 @@ class SQLUpdateCompiler(compiler.SQLUpdateCompiler, SQLCompiler):
         """Support returning identity val with single query."""
         """ Sumit here goes the select * from """
 
+        merge = self.bulk_update_as_sql()
+        if merge is not None:
+            return merge
+
         sql, params, *_ = super().as_sql()
 
         original_string = f'"{self.query.base_table}"."RRN()"'
@@ -79,6 +749,83 @@ class SQLUpdateCompiler(compiler.SQLUpdateCompiler, SQLCompiler):
 
         return (sql, params)
 
+    def bulk_update_as_sql(self):
+        """
+        A bulk_update() batch, ``SET col = CASE WHEN pk = ? THEN ? ... END WHERE pk IN (...)`` for every
+        field, as one MERGE against a VALUES table with a row per object; None for any other update.
+        """
+        query = self.query
+        opts = query.get_meta()
+        pk = opts.pk
+        if not self.connection.features.supports_bulk_update_merge or not query.values:
+            return None
+        # parent table updates of multi-table inheritance get their pks from pre_sql_setup(), which
+        # selects them before Django's own statement
+        if query.related_updates:
+            return None
+        if str(pk.column).upper() == 'RRN()' or not pk.concrete:
+            return None
+        pks = bulk_update_pks(query.where, pk)
+        if pks is None or len(set(pks)) != len(pks):
+            return None
+        columns = [pk]
+        rows = [[pk.get_db_prep_value(value, self.connection, prepared=True)] for value in pks]
+        for field, _, value in query.values:
+            whens = bulk_update_whens(value, pk)
+            if whens is None or [key for key, _ in whens] != pks:
+                return None
+            columns.append(field)
+            for row, (_, then) in zip(rows, whens):
+                row.append(then)
+        placeholder_rows, params = [], []
+        for row in rows:
+            placeholders = ['%s']
+            params.append(row[0])
+            for then in row[1:]:
+                sql, then_params = self.compile(then)
+                placeholders.append(sql)
+                params.extend(then_params)
+            placeholder_rows.append(placeholders)
+        qn = self.connection.ops.quote_name
+        names = [qn(field.column) for field in columns]
+        assignments = ', '.join(f'{name} = S.{name}' for name in names[1:])
+        sql = (
+            f'MERGE INTO {qn(opts.db_table)} AS T USING (VALUES '
+            f'{typed_values_sql(self.connection, columns, placeholder_rows)}) AS S ({", ".join(names)}) '
+            f'ON T.{names[0]} = S.{names[0]} WHEN MATCHED THEN UPDATE SET {assignments}'
+        )
+        return sql, tuple(params)
+
+
+def bulk_update_pks(where, pk):
+    """Values of ``where`` when it is only the ``pk IN (...)`` filter of bulk_update()"""
+    if where.negated or len(where.children) != 1:
+        return None
+    lookup = where.children[0]
+    if not isinstance(lookup, In) or not isinstance(lookup.lhs, Col) or lookup.lhs.target != pk:
+        return None
+    if not isinstance(lookup.rhs, (list, tuple)):
+        return None
+    return list(lookup.rhs)
+
+
+def bulk_update_whens(value, pk):
+    """[(pk value, Value)] of a bulk_update() ``CASE WHEN pk = ? THEN ? ...``, or None"""
+    if not isinstance(value, Case):
+        return None
+    whens = []
+    for when in value.cases:
+        condition = when.condition
+        if not isinstance(condition, WhereNode) or condition.negated or len(condition.children) != 1:
+            return None
+        lookup = condition.children[0]
+        if not isinstance(lookup, Exact) or not isinstance(lookup.lhs, Col) or lookup.lhs.target != pk:
+            return None
+        # a column reference has no meaning inside VALUES
+        if not isinstance(when.result, Value):
+            return None
+        whens.append((lookup.rhs, when.result))
+    return whens
 
 
 class SQLAggregateCompiler(compiler.SQLAggregateCompiler, SQLCompiler):
@@ -86,10 +833,13 @@ class SQLAggregateCompiler(compiler.SQLAggregateCompiler, SQLCompiler):
         """Support returning identity val with single query."""
         """ Sumit here goes the select * from """
 
-        sql, params, *_ = super().as_sql()
+        with compiling() as outermost:
+            sql, params, *_ = super().as_sql()
 
         original_string = f'"{self.query.base_table}"."RRN()"'
         new_string = f"RRN({self.query.base_table})"
         sql = sql.replace(original_string, new_string)
+        if outermost:
+            sql = isolation_sql(self, self.query.inner_query, sql)
 
         return (sql, params)
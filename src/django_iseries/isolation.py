@@ -0,0 +1,38 @@
+"""
+Statement level isolation for querysets.
+
+    class Order(models.Model):
+        objects = IsolationManager()
+
+    Order.objects.filter(status='OPEN').with_isolation('UR')
+
+adds ``WITH UR`` to the statement, so a reporting query neither waits for nor takes the row locks of
+the connection's commitment control level. The 'ISOLATION' database setting applies a level to every
+SELECT of a connection, e.g. 'UR' for a read-only alias; with_isolation() overrides it per queryset.
+Only the outermost statement gets the clause: it covers the subqueries and union parts inside it.
+"""
+
+from django.db import models
+
+from django_iseries.compiler import isolation_level
+
+
+def with_isolation(queryset, level):
+    """``queryset`` run with isolation level NC, UR, CS, RS or RR; None falls back to the setting"""
+    if level is not None:
+        level = isolation_level(level)
+    queryset = queryset.all()
+    queryset.query.isolation = level
+    return queryset
+
+
+class IsolationQuerySetMixin:
+    def with_isolation(self, level):
+        return with_isolation(self, level)
+
+
+class IsolationQuerySet(IsolationQuerySetMixin, models.QuerySet):
+    pass
+
+
+IsolationManager = models.Manager.from_queryset(IsolationQuerySet)
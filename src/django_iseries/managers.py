@@ -0,0 +1,28 @@
+"""
+One queryset with every backend queryset method.
+
+    class Order(models.Model):
+        objects = ISeriesManager()
+
+    Order.objects.filter(status='OPEN').with_isolation('UR').optimize_for(25)
+
+The feature modules each ship a queryset and manager of their own (IsolationManager, KeysetManager,
+...), which a model can only use one of. ISeriesQuerySet combines their mixins; a custom queryset can
+pick the mixins it needs the same way.
+"""
+
+from django.db import models
+
+from django_iseries.isolation import IsolationQuerySetMixin
+from django_iseries.pagination import KeysetQuerySetMixin
+from django_iseries.query import OptimizeForQuerySetMixin
+from django_iseries.upsert import UpsertQuerySetMixin
+
+
+class ISeriesQuerySet(
+    IsolationQuerySetMixin, OptimizeForQuerySetMixin, KeysetQuerySetMixin, UpsertQuerySetMixin, models.QuerySet
+):
+    pass
+
+
+ISeriesManager = models.Manager.from_queryset(ISeriesQuerySet)
@@ -33,6 +33,64 @@ from django_iseries import query
 
 dbms_name = 'dbms_name'
 
+# Date part extraction other than the same-named scalar function ({x} is the date, time or timestamp)
+EXTRACT_SQL = {
+    'week_day': 'DAYOFWEEK({x})',
+    'iso_week_day': 'DAYOFWEEK_ISO({x})',
+    'week': 'WEEK_ISO({x})',
+    # the ISO week-numbering year is the year of the week's Thursday
+    'iso_year': 'YEAR({x} + (4 - DAYOFWEEK_ISO({x})) DAYS)',
+}
+
+# Truncation: TRUNC_TIMESTAMP formats, and date arithmetic for releases without TRUNC_TIMESTAMP
+TRUNC_FORMATS = {
+    'year': 'YEAR', 'quarter': 'Q', 'month': 'MONTH', 'week': 'IW', 'day': 'DD', 'hour': 'HH', 'minute': 'MI', 'second': 'SS',
+}
+DATE_TRUNC_SQL = {
+    'year': 'DATE({x}) - (DAYOFYEAR({x}) - 1) DAYS',
+    'quarter': 'DATE({x}) - (DAY({x}) - 1) DAYS - MOD(MONTH({x}) - 1, 3) MONTHS',
+    'month': 'DATE({x}) - (DAY({x}) - 1) DAYS',
+    'week': 'DATE({x}) - (DAYOFWEEK_ISO({x}) - 1) DAYS',
+    'day': 'DATE({x})',
+}
+# TIME() of a timestamp drops the fractional seconds
+TIME_TRUNC_SQL = {
+    'hour': 'TIME({x}) - MINUTE({x}) MINUTES - SECOND({x}) SECONDS',
+    'minute': 'TIME({x}) - SECOND({x}) SECONDS',
+    'second': 'TIME({x})',
+}
+
+
+def repeat_sql(template, sql, params):
+    """Substitute ``sql`` for every {x} of ``template``, repeating its params as often"""
+    return template.replace('{x}', sql), tuple(params) * template.count('{x}')
+
+
+# Bulk insert limits: parameter markers per statement, and statement length; the backend connects with
+# extended dynamic SQL packages (XDYNAMIC=1), which only keep statements up to the package limit
+MAX_STATEMENT_PARAMS = 32767
+PACKAGE_STATEMENT_LENGTH = 32767
+# SELECT ... FROM FINAL TABLE (INSERT INTO ... VALUES ...) around the rows, without the names
+INSERT_STATEMENT_OVERHEAD = 64
+# MERGE INTO ... AS T USING (VALUES ...) AS S (...) ON ... WHEN ... THEN ..., without the names
+MERGE_STATEMENT_OVERHEAD = 128
+
+# Linear cost model of inserting n rows, in milliseconds: a multi-row VALUES statement is prepared for
+# every distinct batch size, an array-bound executemany prepares one single-row INSERT once per batch
+# but binds every parameter per row. benchmarks/bulk_insert.py measures these for a host.
+DEFAULT_BULK_INSERT_COSTS = {
+    'VALUES_STATEMENT': 4.0,
+    'VALUES_ROW': 0.04,
+    'EXECUTEMANY_STATEMENT': 6.0,
+    'EXECUTEMANY_ROW': 0.01,
+}
+
+
+# __regex/__iregex: the bound pattern and the REGEXP_LIKE / XQuery fn:matches() flags of each lookup
+REGEX_PATTERN_SQL = 'CAST(%s AS VARCHAR(32000) CCSID 1208)'
+REGEXP_LIKE_FLAGS = {'regex': 'c', 'iregex': 'i'}
+XQUERY_REGEX_FLAGS = {'regex': '', 'iregex': 'i'}
+
 
 class DatabaseOperations(BaseDatabaseOperations):
     def __init__(self, connection):
@@ -40,6 +98,12 @@ class DatabaseOperations(BaseDatabaseOperations):
         self.connection = connection
 
     compiler_module = "django_iseries.compiler"
+    # CAST targets of fields whose column type is not a data type on its own (e.g. in MERGE source rows)
+    cast_data_types = {
+        'AutoField': 'INTEGER',
+        'BigAutoField': 'BIGINT',
+        'SmallAutoField': 'SMALLINT',
+    }
 
     def cache_key_culling_sql(self):
         return '''select cache_key 
@@ -125,9 +189,13 @@ class DatabaseOperations(BaseDatabaseOperations):
             return sql
         return 'CAST(%s AS BIGINT) MICROSECONDS' % sql
 
-    def datetime_cast_date_sql(self, field_name, tzname):
-        field_name = self._convert_field_to_tz(field_name, tzname)
-        return "DATE(%s)" % field_name
+    def datetime_cast_date_sql(self, sql, params, tzname):
+        sql = self._convert_field_to_tz(sql, tzname)
+        return f"DATE({sql})", params
+
+    def datetime_cast_time_sql(self, sql, params, tzname):
+        sql = self._convert_field_to_tz(sql, tzname)
+        return f"TIME({sql})", params
 
     def field_cast_sql(self, db_type, internal_type):
         if db_type == 'SMALLINT' and internal_type == 'BooleanField':
@@ -135,12 +203,10 @@ class DatabaseOperations(BaseDatabaseOperations):
         return super().field_cast_sql(db_type, internal_type)
 
     # Function to extract day, month or year from the date.
-    # Reference: http://publib.boulder.ibm.com/infocenter/db2luw/v9r5/topic/com.ibm.db2.luw.sql.ref.doc/doc/r0023457.html
-    def date_extract_sql(self, lookup_type, field_name):
-        if lookup_type.upper() == 'WEEK_DAY':
-            return " DAYOFWEEK(%s) " % (field_name)
-        else:
-            return " %s(%s) " % (lookup_type.upper(), field_name)
+    # Filters on the year or date of a bare column are compiled to ranges instead, see compiler.sargable_date_sql()
+    def date_extract_sql(self, lookup_type, sql, params):
+        template = EXTRACT_SQL.get(lookup_type, f'{lookup_type.upper()}({{x}})')
+        return repeat_sql(template, sql, params)
 
     def adapt_timefield_value(self, value):
         """
@@ -179,46 +245,36 @@ class DatabaseOperations(BaseDatabaseOperations):
         return value
 
     # Function to extract time zone-aware day, month or day of week from timestamps   
-    def datetime_extract_sql(self, lookup_type, field_name, tzname):
-        if settings.USE_TZ:
-            raise NotImplemented
-
-        if lookup_type.upper() == 'WEEK_DAY':
-            return " DAYOFWEEK(%s) " % (field_name)
-        else:
-            return " %s(%s) " % (lookup_type.upper(), field_name)
+    def datetime_extract_sql(self, lookup_type, sql, params, tzname):
+        if settings.USE_TZ and tzname != self.connection.timezone_name:
+            raise NotImplementedError('Db2 for iSeries cannot convert timestamps between time zones')
+        return self.date_extract_sql(lookup_type, sql, params)
 
     # Truncating the date value on the basic of lookup type.
-    # e.g If input is 2008-12-04 and month then output will be 2008-12-01 00:00:00
-    # Reference: http://www.ibm.com/developerworks/data/library/samples/db2/0205udfs/index.html
-    def date_trunc_sql(self, lookup_type, field_name):
-        sql = "TIMESTAMP(DATE(SUBSTR(CHAR(%s), 1, %d) || '%s'), TIME('00:00:00'))"
-        if lookup_type.upper() == 'DAY':
-            sql = sql % (field_name, 10, '')
-        elif lookup_type.upper() == 'MONTH':
-            sql = sql % (field_name, 7, '-01')
-        elif lookup_type.upper() == 'YEAR':
-            sql = sql % (field_name, 4, '-01-01')
-        return sql
+    # e.g If input is 2008-12-04 and month then output will be 2008-12-01
+    def date_trunc_sql(self, lookup_type, sql, params, tzname=None):
+        if lookup_type == 'day':
+            return f'DATE({sql})', params
+        if self.connection.features.supports_trunc_timestamp:
+            template = f"DATE(TRUNC_TIMESTAMP(TIMESTAMP({{x}}, TIME('00:00:00')), '{TRUNC_FORMATS[lookup_type]}'))"
+        else:
+            template = DATE_TRUNC_SQL[lookup_type]
+        return repeat_sql(template, sql, params)
 
     # Truncating the time zone-aware timestamps value on the basic of lookup type
-    def datetime_trunc_sql(self, lookup_type, field_name, tzname):
-        sql = "TIMESTAMP(SUBSTR(CHAR(%s), 1, %d) || '%s')"
-        if settings.USE_TZ:
-            raise NotImplemented
-        if lookup_type.upper() == 'SECOND':
-            sql = sql % (field_name, 19, '.000000')
-        if lookup_type.upper() == 'MINUTE':
-            sql = sql % (field_name, 16, '.00.000000')
-        elif lookup_type.upper() == 'HOUR':
-            sql = sql % (field_name, 13, '.00.00.000000')
-        elif lookup_type.upper() == 'DAY':
-            sql = sql % (field_name, 10, '-00.00.00.000000')
-        elif lookup_type.upper() == 'MONTH':
-            sql = sql % (field_name, 7, '-01-00.00.00.000000')
-        elif lookup_type.upper() == 'YEAR':
-            sql = sql % (field_name, 4, '-01-01-00.00.00.000000')
-        return sql, []
+    def datetime_trunc_sql(self, lookup_type, sql, params, tzname):
+        if settings.USE_TZ and tzname != self.connection.timezone_name:
+            raise NotImplementedError('Db2 for iSeries cannot convert timestamps between time zones')
+        if self.connection.features.supports_trunc_timestamp:
+            template = f"TRUNC_TIMESTAMP({{x}}, '{TRUNC_FORMATS[lookup_type]}')"
+        elif lookup_type in TIME_TRUNC_SQL:
+            template = f'TIMESTAMP(DATE({{x}}), {TIME_TRUNC_SQL[lookup_type]})'
+        else:
+            template = f"TIMESTAMP({DATE_TRUNC_SQL[lookup_type]}, TIME('00:00:00'))"
+        return repeat_sql(template, sql, params)
+
+    def time_trunc_sql(self, lookup_type, sql, params, tzname=None):
+        return repeat_sql(TIME_TRUNC_SQL[lookup_type], sql, params)
 
     def date_interval_sql(self, timedelta):
         return "%d DAYS + %d SECONDS + %d MICROSECONDS" % (
@@ -267,6 +323,17 @@ class DatabaseOperations(BaseDatabaseOperations):
     def no_limit_value(self):
         return None
 
+    def limit_offset_sql(self, low_mark, high_mark):
+        """
+        Slicing clause for releases with OFFSET/FETCH FIRST (features.supports_offset_fetch).
+        compiler.SQLCompiler wraps the query in ROW_NUMBER() on older releases instead.
+        """
+        limit, offset = self._get_limit_offset_params(low_mark, high_mark)
+        return ' '.join(sql for sql in (
+            f'OFFSET {offset:d} ROWS' if offset else None,
+            f'FETCH FIRST {limit:d} ROWS ONLY' if limit else None,
+        ) if sql)
+
     # Method to point custom query class implementation.
     def query_class(self, DefaultQueryClass):
         return query.query_class(DefaultQueryClass)
@@ -291,10 +358,16 @@ class DatabaseOperations(BaseDatabaseOperations):
         return "SYSFUN.RAND()"
 
     def regex_lookup(self, lookup_type):
-        if lookup_type == 'regex':
-            return '''xmlcast( xmlquery('fn:matches(xs:string($c), "%%s")' passing %s as "c") as varchar(5)) = 'true' db2regexExtraField(%s)'''
-        else:
-            return '''xmlcast( xmlquery('fn:matches(xs:string($c), "%%s", "i")' passing %s as "c") as varchar(5)) = 'true' db2regexExtraField(%s)'''
+        """
+        REGEXP_LIKE where the release has it, else XQuery fn:matches(), which runs the XML engine
+        for every row. The pattern is bound as a parameter in both.
+        """
+        if self.connection.features.supports_regexp_like:
+            return f"REGEXP_LIKE(%s, {REGEX_PATTERN_SQL}, '{REGEXP_LIKE_FLAGS[lookup_type]}')"
+        return (
+            f"XMLCAST(XMLQUERY('fn:matches(xs:string($c), xs:string($p), \"{XQUERY_REGEX_FLAGS[lookup_type]}\")' "
+            f"PASSING %s AS \"c\", {REGEX_PATTERN_SQL} AS \"p\") AS VARCHAR(5)) = 'true'"
+        )
 
     # As save-point is supported by DB2, following function will return SQL to create savepoint.
     def savepoint_create_sql(self, sid):
@@ -420,11 +493,69 @@ class DatabaseOperations(BaseDatabaseOperations):
         else:
             return value
 
-    def year_lookup_bounds_for_date_field(self, value):
+    def year_lookup_bounds_for_date_field(self, value, iso_year=False):
+        if iso_year:
+            return super().year_lookup_bounds_for_date_field(value, iso_year)
         lower_bound = datetime.date(int(value), 1, 1)
         upper_bound = datetime.date(int(value), 12, 31)
         return [lower_bound, upper_bound]
 
+    def bulk_batch_size(self, fields, objs):
+        """
+        Rows per statement: as many as fit both the host's parameter marker limit and the statement
+        length limit ('MAX_STATEMENT_PARAMS' and 'MAX_STATEMENT_LENGTH' database settings).
+        """
+        if (len(fields) > 2 and fields[0] is fields[1] and getattr(fields[0], 'primary_key', False)
+                and self.connection.features.supports_bulk_update_merge):
+            # bulk_update() passes the pk twice (CASE and IN list); its MERGE binds it once per row
+            return self.merge_batch_size(fields[1:])
+        max_params, max_length = self.statement_limits()
+        params_per_row = max(len(fields), 1)
+        names = [self.quote_name(getattr(field, 'column', None) or str(field)) for field in fields]
+        model = getattr(fields[0], 'model', None) if fields else None
+        if model is not None:
+            # the table is named twice, in the INSERT and as the FINAL TABLE correlation name
+            names.extend([self.quote_name(model._meta.db_table)] * 2)
+        header = INSERT_STATEMENT_OVERHEAD + sum(len(name) + 2 for name in names)
+        # '(?, ?, ?), ' per row
+        row_length = 3 * params_per_row + 2
+        rows = min(max_params // params_per_row, (max_length - header) // row_length)
+        return max(rows, 1)
+
+    def merge_batch_size(self, fields):
+        """Rows per MERGE against a VALUES table of typed markers for ``fields``, in the same limits"""
+        max_params, max_length = self.statement_limits()
+        names = [self.quote_name(field.column) for field in fields]
+        # the table is named twice; columns up to four times (source list, ON or SET, INSERT, S.)
+        header = (
+            MERGE_STATEMENT_OVERHEAD + 2 * len(self.quote_name(fields[0].model._meta.db_table))
+            + 4 * sum(len(name) + 4 for name in names)
+        )
+        # '(CAST(? AS INTEGER), ...), ' per row
+        row_length = sum(len(f'CAST(? AS {field.cast_db_type(self.connection)}), ') for field in fields) + 2
+        rows = min(max_params // len(fields), (max_length - header) // row_length)
+        return max(rows, 1)
+
+    def statement_limits(self):
+        """(parameter markers, statement length) a statement may have"""
+        settings_dict = self.connection.settings_dict
+        return (
+            int(settings_dict.get('MAX_STATEMENT_PARAMS', MAX_STATEMENT_PARAMS)),
+            int(settings_dict.get('MAX_STATEMENT_LENGTH', PACKAGE_STATEMENT_LENGTH)),
+        )
+
+    def bulk_insert_costs(self):
+        return dict(DEFAULT_BULK_INSERT_COSTS, **self.connection.settings_dict.get('BULK_INSERT_COSTS', {}))
+
+    def use_executemany_for_insert(self, rows):
+        """Whether an array-bound executemany inserts ``rows`` rows cheaper than one multi-row VALUES"""
+        if rows < 2 or not self.connection.databaseWrapper.fast_executemany:
+            return False
+        costs = self.bulk_insert_costs()
+        values = costs['VALUES_STATEMENT'] + rows * costs['VALUES_ROW']
+        executemany = costs['EXECUTEMANY_STATEMENT'] + rows * costs['EXECUTEMANY_ROW']
+        return executemany < values
+
     def bulk_insert_sql(self, fields, placeholder_rows):
         placeholder_rows_sql = (", ".join(row) for row in placeholder_rows)
         values_sql = ", ".join(f'({sql})' for sql in placeholder_rows_sql)
@@ -449,6 +580,12 @@ class DatabaseOperations(BaseDatabaseOperations):
     def fetch_returned_insert_ids(self, cursor):
         return [id_ for (id_, ) in cursor.fetchall()]
 
+    def fetch_returned_insert_rows(self, cursor):
+        return cursor.fetchall()
+
+    def fetch_returned_insert_columns(self, cursor, returning_params):
+        return cursor.fetchone()
+
     def return_insert_id(self):
         """empty implementation as we implement returned ids with a cursor and custom Insert compiler"""
         return None, None
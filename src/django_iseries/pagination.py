@@ -0,0 +1,265 @@
+"""
+Keyset (seek) pagination.
+
+Instead of skipping ``offset`` rows, every page starts right after the ordering key of the previous
+page's last row:
+
+    SELECT ... WHERE "A" >= ? AND ("A", "B") > (?, ?) ORDER BY "A", "B" FETCH FIRST 20 ROWS ONLY
+
+so an index on the ordering key is probed at the same cost on page 1 and on page 10,000. The
+redundant leading ``"A" >= ?`` gives the optimizer a plain range on the first index column.
+
+    class Order(models.Model):
+        objects = KeysetManager()
+
+    Order.objects.order_by('customer', 'pk').seek(cursor, size=20)
+    KeysetPaginator(Order.objects.order_by('customer'), 20).page(request.GET.get('cursor'))
+
+Ordering keys are model fields of the queryset's model, including ``RRN()`` pseudo-columns and the
+columns of a ``CompositeKey``. The primary key is appended when it is not part of the ordering so
+that keys are unique. Keys should not be nullable: NULLs never compare greater or less.
+"""
+
+import base64
+import binascii
+import datetime
+import decimal
+import json
+import uuid
+
+from django.core.paginator import InvalidPage, Page, Paginator
+from django.db import models
+from django.db.models.expressions import Expression, F
+from django.db.models.sql.where import AND
+
+from django_iseries.compositeKey import CompositeKey
+
+
+class RowValueCompare(Expression):
+    """
+    ``("A", "B") > (%s, %s)`` predicate; the values are bound through each column's field.
+    Added to the WHERE clause directly: filter() would compare a boolean expression to True, which
+    this backend casts to a SMALLINT that is not a valid predicate on its own.
+    """
+    conditional = True
+
+    def __init__(self, columns, operator, values):
+        super().__init__(output_field=models.BooleanField())
+        self.columns = [F(column) if isinstance(column, str) else column for column in columns]
+        self.operator = operator
+        self.values = list(values)
+
+    def get_source_expressions(self):
+        return self.columns
+
+    def set_source_expressions(self, exprs):
+        self.columns = exprs
+
+    def as_sql(self, compiler, connection):
+        columns_sql, params = [], []
+        for column in self.columns:
+            sql, column_params = compiler.compile(column)
+            columns_sql.append(sql)
+            params.extend(column_params)
+        values = [
+            column.output_field.get_db_prep_value(value, connection)
+            for column, value in zip(self.columns, self.values)
+        ]
+        leading_operator = self.operator[0] + '='
+        sql = '%s %s %%s AND (%s) %s (%s)' % (
+            columns_sql[0], leading_operator,
+            ', '.join(columns_sql), self.operator, ', '.join(['%s'] * len(values)),
+        )
+        return sql, params + values[:1] + params + values
+
+
+def keyset_keys(queryset):
+    """
+    [(field name, field, descending)] of the queryset's ordering, expanded to unique keys.
+    Raises ValueError for orderings keyset pagination cannot seek on.
+    """
+    opts = queryset.model._meta
+    ordering = queryset.query.order_by or opts.ordering or ()
+    keys = []
+    for item in ordering:
+        if not isinstance(item, str):
+            raise ValueError(f'Keyset pagination needs field names to order by, not {item!r}')
+        name, descending = (item[1:], True) if item.startswith('-') else (item, False)
+        keys.extend((field.name, field, descending) for field in _key_fields(opts, name))
+
+    descending = keys[0][2] if keys else False
+    if any(key[2] != descending for key in keys):
+        raise ValueError('Keyset pagination needs all ordering keys in the same direction')
+    names = {name for name, _, _ in keys}
+    keys.extend(
+        (field.name, field, descending) for field in _key_fields(opts, 'pk') if field.name not in names
+    )
+    return keys
+
+
+def _key_fields(opts, name):
+    if '__' in name or name == '?':
+        raise ValueError(f'Keyset pagination cannot order by {name!r}')
+    field = opts.pk if name == 'pk' else opts.get_field(name)
+    if isinstance(field, CompositeKey):
+        return [opts.get_field(column) for column in field.columns]
+    return [field]
+
+
+def seek(queryset, cursor=None, size=None, backwards=False):
+    """
+    Rows of ``queryset`` after ``cursor`` in its ordering; with ``backwards`` the rows before it,
+    nearest first. ``cursor`` is a token from encode_cursor() or a sequence of key values.
+    """
+    keys = keyset_keys(queryset)
+    descending = keys[0][2] != backwards
+    queryset = queryset.order_by(*(('-' if descending else '') + name for name, _, _ in keys))
+    if cursor is not None:
+        values = decode_cursor(cursor)[0] if isinstance(cursor, str) else list(cursor)
+        if len(values) != len(keys):
+            raise ValueError(f'Cursor has {len(values)} values for {len(keys)} ordering keys')
+        condition = RowValueCompare([name for name, _, _ in keys], '<' if descending else '>', values)
+        queryset = queryset.all()
+        queryset.query.where.add(condition.resolve_expression(queryset.query, allow_joins=False), AND)
+    if size is not None:
+        queryset = queryset[:size]
+    return queryset
+
+
+def key_values(keys, row):
+    if isinstance(row, dict):
+        return [row[name] for name, _, _ in keys]
+    return [field.value_from_object(row) for _, field, _ in keys]
+
+
+def encode_cursor(values, backwards=False):
+    """Opaque, URL safe cursor token. Values are bound as parameters, so tokens need no signing."""
+    payload = json.dumps({'v': [_dump(value) for value in values], 'b': backwards}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).rstrip(b'=').decode()
+
+
+def decode_cursor(token):
+    """(values, backwards) of a cursor token; raises InvalidPage for anything else"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        return [_load(value) for value in payload['v']], bool(payload['b'])
+    except (binascii.Error, ValueError, TypeError, KeyError) as e:
+        raise InvalidPage(f'Invalid cursor: {token!r}') from e
+
+
+# JSON tags of the key value types that JSON has no literal for, checked in order
+_TAGGED_TYPES = (
+    ('dt', datetime.datetime, datetime.datetime.isoformat, datetime.datetime.fromisoformat),
+    ('d', datetime.date, datetime.date.isoformat, datetime.date.fromisoformat),
+    ('t', datetime.time, datetime.time.isoformat, datetime.time.fromisoformat),
+    ('dec', decimal.Decimal, str, decimal.Decimal),
+    ('uuid', uuid.UUID, str, uuid.UUID),
+    ('b', bytes, lambda value: base64.b64encode(value).decode(), base64.b64decode),
+)
+
+
+def _dump(value):
+    for tag, type_, dump, _ in _TAGGED_TYPES:
+        if isinstance(value, type_):
+            return {tag: dump(value)}
+    return value
+
+
+def _load(value):
+    if isinstance(value, dict):
+        (tag, dumped), = value.items()
+        for known_tag, _, _, load in _TAGGED_TYPES:
+            if tag == known_tag:
+                return load(dumped)
+        raise ValueError(f'Unknown cursor value type {tag!r}')
+    return value
+
+
+class KeysetQuerySetMixin:
+    def seek(self, cursor=None, *, size=None, backwards=False):
+        return seek(self, cursor, size, backwards)
+
+    def cursor_for(self, row, backwards=False):
+        """Cursor token positioned at ``row`` (a model instance or a values() dict)"""
+        return encode_cursor(key_values(keyset_keys(self), row), backwards)
+
+
+class KeysetQuerySet(KeysetQuerySetMixin, models.QuerySet):
+    pass
+
+
+KeysetManager = models.Manager.from_queryset(KeysetQuerySet)
+
+
+class KeysetPage(Page):
+    """
+    Page of a KeysetPaginator. next_page_number() and previous_page_number() return cursor tokens,
+    so templates building ``?page=`` links keep working. A keyset page has no absolute position in
+    the queryset: start_index() and end_index() are 1-based positions within the page (0 for an
+    empty page).
+    """
+
+    def __init__(self, object_list, paginator, next_cursor, previous_cursor):
+        super().__init__(object_list, None, paginator)
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f'<Keyset page of {len(self.object_list)} rows>'
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def next_page_number(self):
+        if self.next_cursor is None:
+            raise InvalidPage('That page contains no results')
+        return self.next_cursor
+
+    def previous_page_number(self):
+        if self.previous_cursor is None:
+            raise InvalidPage('That page contains no results')
+        return self.previous_cursor
+
+    def start_index(self):
+        return 1 if self.object_list else 0
+
+    def end_index(self):
+        return len(self.object_list)
+
+
+class KeysetPaginator(Paginator):
+    """
+    Paginator that seeks to pages by cursor instead of page number. ``count`` and ``num_pages``
+    still work but cost a COUNT(*) over the whole queryset.
+    """
+
+    def page(self, cursor=None):
+        keys = keyset_keys(self.object_list)
+        values, backwards = decode_cursor(cursor) if cursor else (None, False)
+        rows = list(seek(self.object_list, values, self.per_page + 1, backwards))
+        more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+        if not rows:
+            if cursor and not self.allow_empty_first_page:
+                raise InvalidPage('That page contains no results')
+            return KeysetPage(rows, self, None, None)
+
+        has_next = more if not backwards else True
+        has_previous = (more if backwards else cursor is not None)
+        return KeysetPage(
+            rows,
+            self,
+            encode_cursor(key_values(keys, rows[-1])) if has_next else None,
+            encode_cursor(key_values(keys, rows[0]), backwards=True) if has_previous else None,
+        )
+
+    def get_page(self, cursor=None):
+        try:
+            return self.page(cursor)
+        except InvalidPage:
+            return self.page(None)
@@ -0,0 +1,330 @@
+"""
+Process-wide connection pool for the django_iseries backend.
+
+Signing on to an IBM i host server is expensive (prestart job allocation, authority checks), so with
+the 'POOL' database setting pybase.DatabaseWrapper checks connections out of a pool shared by every
+Django connection with the same DSN, user, library list and session setup, and returns them on close().
+"""
+
+import os
+import threading
+import time
+
+from django.db import utils
+
+DEFAULT_POOL_OPTIONS = {
+    'MIN_SIZE': 0,
+    'MAX_SIZE': 10,
+    # seconds a connection may sit idle in the pool, and may live in total, before it is closed
+    'MAX_IDLE': 300,
+    'MAX_LIFETIME': 3600,
+    # seconds checkout() waits for a connection when MAX_SIZE connections are in use
+    'TIMEOUT': 30,
+    # open MIN_SIZE connections in parallel as soon as the pool is created
+    'PREWARM': True,
+    # seconds between background liveness probes of idle connections; 0 disables the ping thread
+    'PING_INTERVAL': 0,
+}
+
+# Upper bounds (seconds) of the wait-time and checkout-time histogram buckets
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30)
+
+# Connections opened by the parent of a forked process. They share the parent's sockets, so the child
+# must neither use nor close them; holding a reference keeps pyodbc from closing them on deallocation.
+_abandoned = []
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(key, connect, options, probe=None):
+    """Return the process-wide pool for ``key``, creating (and pre-warming) it on first use"""
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(connect, options, probe)
+            if pool.prewarm_on_start:
+                pool.prewarm()
+            pool.start_pinger()
+        return pool
+
+
+def all_pools():
+    with _pools_lock:
+        return list(_pools.values())
+
+
+def _reinit_after_fork():
+    global _pools_lock
+    _pools_lock = threading.Lock()
+    for pool in _pools.values():
+        pool.after_fork()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reinit_after_fork)
+
+
+class Histogram:
+    """Counts of observed durations per bucket, plus their number and sum"""
+
+    def __init__(self, bounds=DURATION_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        idx = len(self.bounds)
+        for i, bound in enumerate(self.bounds):
+            if seconds <= bound:
+                idx = i
+                break
+        with self._lock:
+            self.counts[idx] += 1
+            self.count += 1
+            self.sum += seconds
+
+    def snapshot(self):
+        labels = [f'<={bound}' for bound in self.bounds] + ['+Inf']
+        return {'count': self.count, 'sum': self.sum, 'buckets': dict(zip(labels, self.counts))}
+
+
+class PooledConnection:
+    def __init__(self, connection, init_report=None):
+        self.connection = connection
+        self.init_report = init_report
+        # per physical connection state kept by pybase.DatabaseWrapper while the connection is checked out
+        self.statement_cache = None
+        self.current_schema = None
+        self.pid = os.getpid()
+        self.created = self.last_used = self.last_alive = time.monotonic()
+        self.checked_out_at = None
+
+
+class ConnectionPool:
+    """
+    Bounded pool of open connections.
+
+    ``connect`` opens and initializes a new connection and returns ``(connection, init_report)``.
+    Connections are handed out most-recently-used first; idle or too old ones are closed on the way.
+    ``probe(connection)`` returns whether a connection is alive; with PING_INTERVAL set a daemon
+    thread uses it to weed out dead idle connections before they are handed out.
+    """
+
+    def __init__(self, connect, options=None, probe=None):
+        options = dict(DEFAULT_POOL_OPTIONS, **(options or {}))
+        self.connect = connect
+        self.probe = probe
+        self.min_size = options['MIN_SIZE']
+        self.max_size = max(options['MAX_SIZE'], 1)
+        self.max_idle = options['MAX_IDLE']
+        self.max_lifetime = options['MAX_LIFETIME']
+        self.timeout = options['TIMEOUT']
+        self.prewarm_on_start = options['PREWARM']
+        self.ping_interval = options['PING_INTERVAL']
+
+        self.pid = os.getpid()
+        self.wait_time = Histogram()
+        self.checkout_time = Histogram()
+        self.opened = 0
+        self.closed = 0
+        self.timeouts = 0
+        self.broken = 0
+        self._pinger = None
+        self._idle = []
+        # open connections, including checked out ones and ones being opened
+        self._size = 0
+        self._condition = threading.Condition()
+
+    def checkout(self):
+        started = time.monotonic()
+        entry = None
+        expired = []
+        with self._condition:
+            self._check_fork()
+            while True:
+                now = time.monotonic()
+                while self._idle:
+                    candidate = self._idle.pop()
+                    if self._expired(candidate, now):
+                        self._size -= 1
+                        expired.append(candidate)
+                    else:
+                        entry = candidate
+                        break
+                if entry is not None:
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    break
+                remaining = started + self.timeout - now
+                if remaining <= 0:
+                    self.timeouts += 1
+                    self._close_all(expired)
+                    raise utils.OperationalError(
+                        f'Timed out after {self.timeout}s waiting for one of {self.max_size} pooled connections'
+                    )
+                self._condition.wait(remaining)
+        self._close_all(expired)
+
+        if entry is None:
+            entry = self._open()
+        self.wait_time.observe(time.monotonic() - started)
+        entry.checked_out_at = time.monotonic()
+        return entry
+
+    def checkin(self, entry, reset):
+        """Return a connection; ``reset(connection)`` must restore its session state and return True to keep it"""
+        now = time.monotonic()
+        if entry.checked_out_at is not None:
+            self.checkout_time.observe(now - entry.checked_out_at)
+            entry.checked_out_at = None
+        if entry.pid != os.getpid():
+            _abandoned.append(entry.connection)
+            return
+
+        keep = now - entry.created < self.max_lifetime
+        if keep:
+            try:
+                keep = reset(entry.connection)
+            except Exception:
+                keep = False
+
+        with self._condition:
+            self._check_fork()
+            if keep:
+                entry.last_used = now
+                self._idle.append(entry)
+            else:
+                self._size -= 1
+            self._condition.notify()
+            refill = self._size < self.min_size
+        if not keep:
+            self._close_all([entry])
+        if refill:
+            self.prewarm()
+
+    def prewarm(self):
+        """Open connections in parallel until the pool holds MIN_SIZE; return the opening threads"""
+        with self._condition:
+            needed = max(self.min_size - self._size, 0)
+            self._size += needed
+        threads = [threading.Thread(target=self._open_idle, daemon=True) for _ in range(needed)]
+        for thread in threads:
+            thread.start()
+        return threads
+
+    def discard_idle(self, predicate):
+        """Close the idle connections for which ``predicate(connection)`` is true"""
+        with self._condition:
+            discarded = [entry for entry in self._idle if predicate(entry.connection)]
+            self._idle = [entry for entry in self._idle if entry not in discarded]
+            self._size -= len(discarded)
+            self._condition.notify(len(discarded))
+        self._close_all(discarded)
+        return len(discarded)
+
+    def ping_idle(self):
+        """Probe idle connections not used or probed for PING_INTERVAL; close dead and expired ones"""
+        now = time.monotonic()
+        with self._condition:
+            due = [entry for entry in self._idle if now - entry.last_alive >= self.ping_interval]
+            self._idle = [entry for entry in self._idle if entry not in due]
+        alive, dead, expired = [], [], []
+        for entry in due:
+            if self._expired(entry, now):
+                expired.append(entry)
+            elif self.probe(entry.connection):
+                entry.last_alive = time.monotonic()
+                alive.append(entry)
+            else:
+                dead.append(entry)
+        with self._condition:
+            # probed connections go back as the least recently used ones
+            self._idle[:0] = alive
+            self._size -= len(dead) + len(expired)
+            self.broken += len(dead)
+            self._condition.notify(len(dead) + len(expired))
+            refill = self._size < self.min_size
+        self._close_all(dead + expired)
+        if refill:
+            self.prewarm()
+        return len(dead)
+
+    def start_pinger(self):
+        if not self.ping_interval or self.probe is None:
+            return
+        self._pinger = threading.Thread(target=self._ping_forever, args=(os.getpid(),), daemon=True)
+        self._pinger.start()
+
+    def _ping_forever(self, pid):
+        while self.pid == pid:
+            time.sleep(self.ping_interval)
+            if self.pid == pid:
+                self.ping_idle()
+
+    def idle_connections(self):
+        with self._condition:
+            return [entry.connection for entry in self._idle]
+
+    def stats(self):
+        with self._condition:
+            size, idle = self._size, len(self._idle)
+        return {
+            'size': size,
+            'idle': idle,
+            'in_use': size - idle,
+            'opened': self.opened,
+            'closed': self.closed,
+            'timeouts': self.timeouts,
+            'broken': self.broken,
+            'wait_time': self.wait_time.snapshot(),
+            'checkout_time': self.checkout_time.snapshot(),
+        }
+
+    def after_fork(self):
+        self._condition = threading.Condition()
+        self._check_fork()
+        # threads do not survive fork
+        self.start_pinger()
+
+    def _check_fork(self):
+        if self.pid == os.getpid():
+            return
+        _abandoned.extend(entry.connection for entry in self._idle)
+        self._idle = []
+        self._size = 0
+        self.pid = os.getpid()
+
+    def _expired(self, entry, now):
+        return now - entry.last_used > self.max_idle or now - entry.created > self.max_lifetime
+
+    def _open(self):
+        try:
+            entry = PooledConnection(*self.connect())
+        except Exception:
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            raise
+        self.opened += 1
+        return entry
+
+    def _open_idle(self):
+        try:
+            entry = self._open()
+        except Exception:
+            return
+        with self._condition:
+            self._idle.append(entry)
+            self._condition.notify()
+
+    def _close_all(self, entries):
+        for entry in entries:
+            self.closed += 1
+            try:
+                entry.connection.close()
+            except Exception:
+                pass
@@ -18,17 +18,22 @@
 
 
 import datetime
+import decimal
 import platform
 import re
+import threading
+import time
+from collections import namedtuple
 
 # For checking django's version
 from functools import partial
 from typing import Optional
 
-import sqlparse
 from django.db import utils
 
 from django_iseries import Database
+from django_iseries.caches import LRUCache
+from django_iseries.pool import get_pool
 
 dbms_name = 'dbms_name'
 
@@ -46,10 +51,142 @@ FORMAT_QMARK_REGEX = re.compile(r'(?<!%)%s')
 SQLCODE_0530_REGEX = re.compile(r"^(\[.+] *){4}SQL0530.*")
 SQLCODE_0910_REGEX = re.compile(r"^(\[.+] *){4}SQL0910.*")
 
+# iAccess ODBC driver default for the BLOCKSIZE connection keyword (kilobytes)
+DEFAULT_BLOCKSIZE_KB = 256
+# Width assumed for a column whose size the driver does not report, and the most a single column
+# (e.g. a LOB) counts for when sizing a streaming block.
+DEFAULT_COLUMN_BYTES = 16
+MAX_COLUMN_BYTES = 32 * 1024
+
+# Parameter buffer budget of one fast_executemany batch, and the savepoint that lets a failed batch
+# be replayed row by row inside a transaction.
+DEFAULT_EXECUTEMANY_MEMORY_CAP = 16 * 1024 * 1024
+EXECUTEMANY_SAVEPOINT = 'DJANGO_ISERIES_EXECUTEMANY'
+
+# Tokens that matter when looking for placeholders in a select clause: comments, string literals and
+# quoted identifiers (skipped as a whole), '?' markers and the SELECT/FROM keywords.
+SELECT_CLAUSE_TOKEN_REGEX = re.compile(
+    r"""--[^\n]*|/\*.*?\*/|'(?:[^']|'')*'|"(?:[^"]|"")*"|\?|(?<![\w$#@.])(?:SELECT|FROM)(?![\w$#@])""",
+    re.IGNORECASE | re.DOTALL
+)
+SELECT_KEYWORD_REGEX = re.compile(r'(?<![\w$#@.])SELECT(?![\w$#@])', re.IGNORECASE)
+
+SET_SCHEMA_REGEX = re.compile(r'\s*SET\s+(?:CURRENT\s+SCHEMA|CURRENT_SCHEMA|SCHEMA)\b', re.IGNORECASE)
+
+# A parameterized statement rewritten for the driver: the qmark SQL split around every
+# placeholder in a select clause, and the indexes of the params that fill those gaps.
+SelectRewrite = namedtuple('SelectRewrite', ['pieces', 'literal_positions'])
+
+# Db2 for i only accepts typed parameter markers in a select clause. String and binary lengths are
+# rounded up to a power of two so that values of similar length share one statement text.
+MIN_SELECT_MARKER_LENGTH = 32
+MAX_SELECT_MARKER_LENGTH = 32739
+MAX_DECIMAL_PRECISION = 63
+
+# Liveness checks: probe statement, default seconds between probes of a connection that has not
+# run a statement since, and the ODBC connection-dead attribute (SQL_ATTR_CONNECTION_DEAD / SQL_CD_TRUE)
+LIVENESS_PROBE_SQL = 'SELECT 1 FROM SYSIBM.SYSDUMMY1'
+DEFAULT_LIVENESS_INTERVAL = 30
+SQL_ATTR_CONNECTION_DEAD = 1209
+SQL_CD_TRUE = 1
+
+# Raised at the end of the connection init script when any of its steps failed
+INIT_FAILED_SQLSTATE = '75001'
+INIT_FAILED_MARKER = 'DJANGO_ISERIES_INIT_FAILED:'
+INIT_FAILED_REGEX = re.compile(INIT_FAILED_MARKER + r'((?: \d+=\w{5})+)')
+INIT_FAILED_STEP_REGEX = re.compile(r'(\d+)=(\w{5})')
+
+# SQL types bound for a None parameter, taken from the last non-None value seen at the same position
+PARAMETER_SQL_TYPES = (
+    (bool, Database.SQL_SMALLINT),
+    (int, Database.SQL_BIGINT),
+    (float, Database.SQL_DOUBLE),
+    (decimal.Decimal, Database.SQL_DECIMAL),
+    (str, Database.SQL_WVARCHAR),
+    (bytes, Database.SQL_VARBINARY),
+    (datetime.datetime, Database.SQL_TYPE_TIMESTAMP),
+    (datetime.date, Database.SQL_TYPE_DATE),
+    (datetime.time, Database.SQL_TYPE_TIME),
+)
+
+# Rewritten statements keyed by the SQL text Django passes to DB2CursorWrapper.execute().
+# Shared by all connections; rewrite_cache.stats() reports hits, misses and evictions.
+rewrite_cache = LRUCache(maxsize=1024)
+
 
 class DatabaseWrapper:
+    def __init__(self, settings_dict=None):
+        settings_dict = settings_dict or {}
+        # Hand pyodbc.Row objects to Django as they are instead of copying every row into a tuple.
+        self.zero_copy_rows = settings_dict.get('ZERO_COPY_ROWS', False)
+        # Set by the SQL compiler while it runs a query whose rows are only indexed (model instances,
+        # values()); raw cursors, values_list() and the backend's own fetches always get tuples.
+        self.zero_copy_statement = False
+        # Streaming cursors (QuerySet.iterator()) never hand Django more than one driver block of rows.
+        self.stream_block_bytes = int(settings_dict.get('BLOCKSIZE', DEFAULT_BLOCKSIZE_KB)) * 1024
+        # Dedicated pyodbc cursors per statement text, so re-executing a statement skips SQLPrepare.
+        self.statement_cache_size = int(settings_dict.get('STATEMENT_CACHE_SIZE', 0))
+        self.statement_cache = self._new_statement_cache()
+        self.prepares_avoided = 0
+        # Array-bound executemany, split into batches whose parameter buffers fit in the memory cap.
+        self.fast_executemany = settings_dict.get('FAST_EXECUTEMANY', True)
+        self.executemany_memory_cap = int(settings_dict.get('EXECUTEMANY_MEMORY_CAP', DEFAULT_EXECUTEMANY_MEMORY_CAP))
+        # Outcome of each session setup step on the latest connection: [(label, error or None)]
+        self.init_report = []
+        # Process-wide connection pool options; None opens and closes a host connection every time.
+        pool_options = settings_dict.get('POOL')
+        if pool_options is True:
+            pool_options = {}
+        self.pool_options = pool_options if isinstance(pool_options, dict) else None
+        self.pool = None
+        self.pool_entry = None
+        self.currentschema = None
+        # Set when the current schema of a pooled connection is changed, so it is restored on return.
+        self.schema_changed = False
+        # CURRENT_SCHEMA of the open connection, None until known
+        self.current_schema = None
+        # is_active() probes the host at most once per interval; any successful statement counts as a probe.
+        self.liveness_interval = float(settings_dict.get('LIVENESS_INTERVAL', DEFAULT_LIVENESS_INTERVAL))
+        self.last_alive = 0.0
+        self.liveness_probes = 0
+        self.broken_connections_caught = 0
+        # QTEMP tables of statements with staged IN lists that have not been dropped yet
+        self.staged_tables = set()
+
     # Get new database connection for non persistance connection 
     def get_new_connection(self, kwargs):
+        key, connect = self.connection_factory(kwargs)
+        if self.pool_options is None:
+            self.statement_cache.clear()
+            connection, self.init_report = connect()
+            self.last_alive = time.monotonic()
+            self.current_schema = schema_name(self.currentschema)
+            return connection
+
+        self.pool = get_pool(key, connect, self.pool_options, probe=self.probe_connection)
+        self.pool_entry = self.pool.checkout()
+        self.init_report = self.pool_entry.init_report
+        self.last_alive = self.pool_entry.last_alive
+        self.current_schema = schema_name(self.currentschema) or self.pool_entry.current_schema
+        # prepared statements belong to the physical connection, so they stay with it in the pool
+        if self.pool_entry.statement_cache is None:
+            self.pool_entry.statement_cache = self._new_statement_cache()
+        self.statement_cache = self.pool_entry.statement_cache
+        return self.pool_entry.connection
+
+    def prewarm_pool(self, kwargs):
+        """Open the pool's MIN_SIZE connections in parallel without checking one out"""
+        if self.pool_options is None:
+            return []
+        key, connect = self.connection_factory(kwargs)
+        self.pool = get_pool(key, connect, self.pool_options, probe=self.probe_connection)
+        return self.pool.prewarm()
+
+    def connection_factory(self, kwargs):
+        """
+        Build the connection string from Django's connection params.
+        Returns (pool key, function opening and initializing a new connection).
+        """
         driver_name = 'iSeries Access ODBC Driver' if platform.system() == 'Windows' else 'IBM i Access ODBC Driver'
         if 'port' in kwargs and 'host' in kwargs:
             kwargs['dsn'] = f"DRIVER={{{driver_name}}};DATABASE=%s;UNICODESQL=1;XDYNAMIC=1;" \
@@ -142,12 +279,33 @@ class DatabaseWrapper:
             kwargs['dsn'] += f"TRUEAUTOCOMMIT={kwargs.get('trueautocommit')};"
             del kwargs['trueautocommit']
 
+        # --------------------------------------------
+        # Connection String: BLOCKFETCH / BLOCKSIZE
+        # Rows are fetched from the host in blocks of BLOCKSIZE kilobytes (1 - 8192).
+        # Streaming cursors size their fetches to the same block.
+        # --------------------------------------------
+        if 'blocksize' in kwargs:
+            kwargs['dsn'] += f"BLOCKFETCH=1;BLOCKSIZE={kwargs.get('blocksize')};"
+            del kwargs['blocksize']
+
         '''
                 NO Change in connection string after this point 
         
         '''
         dsn = kwargs.pop('dsn', '')
-
+        message_replies = kwargs.pop('message_replies', [])
+        init_script = kwargs.pop('init_script', [])
+        steps = self.connection_init_steps(message_replies, init_script)
+        self.currentschema = currentschema
+        self.schema_changed = False
+        connect = partial(self.open_connection, dsn, kwargs, currentschema, steps)
+        # DSN carries the user and library list; schema and setup steps are part of the session state
+        key = (dsn, repr(sorted(kwargs.items())), currentschema, steps)
+        return key, connect
+
+    @staticmethod
+    def open_connection(dsn, kwargs, currentschema, steps):
+        """Open a host connection and run the session setup; return (connection, init_report)"""
         connection = Database.connect(dsn, **kwargs)
         if currentschema:
             cursor = DB2CursorWrapper(connection)
@@ -155,36 +313,94 @@ class DatabaseWrapper:
 
         # ---------------------------------------------
         # add default message reply ADDRPYLE  # sumit
+        # and any extra session setup, all in one round trip
 
-        message_replies = kwargs.pop('message_replies', [])
         cursor = connection.cursor()
-        for message_reply in message_replies:
-            seq, message_id, reply = message_reply
-            try:
-                call_string = "call QSYS2.QCMDEXC('ADDRPYLE SEQNBR({}) MSGID({}) RPY({})')".format(seq, message_id,
-                                                                                                   reply)
-                cursor.execute("{" + call_string + "}")
-            except Exception as e:
-                pass
-
-        try:
-            cursor.execute("{call QSYS2.QCMDEXC('CHGJOB  INQMSGRPY(*SYSRPYL)')}")
-        except Exception as e:
-            pass
+        init_report = ConnectionInitScript.for_steps(steps).run(cursor)
+        cursor.close()
 
         # ---------------------------------------------
-        return connection
+        return connection, init_report
+
+    @staticmethod
+    def connection_init_steps(message_replies, init_script):
+        """(label, statement) pairs run on every new connection"""
+        steps = []
+        for seq, message_id, reply in message_replies:
+            command = f'ADDRPYLE SEQNBR({seq}) MSGID({message_id}) RPY({reply})'
+            steps.append((command, qcmdexc_sql(command)))
+        command = 'CHGJOB INQMSGRPY(*SYSRPYL)'
+        steps.append((command, qcmdexc_sql(command)))
+        steps.extend((statement, statement) for statement in init_script)
+        return tuple(steps)
 
     # ------------------------------------------------------------------------------------------------------
 
     def is_active(self, connection = None):
-        return bool(connection.cursor())
+        """
+        Whether the connection still works. A connection the driver reports dead fails at once;
+        otherwise the host is probed only when nothing has run on the connection for liveness_interval.
+        """
+        dead = self.connection_dead(connection)
+        if not dead and time.monotonic() - self.last_alive < self.liveness_interval:
+            return True
+        if not dead:
+            self.liveness_probes += 1
+            dead = not self.probe_connection(connection)
+        if dead:
+            self.broken_connections_caught += 1
+            return False
+        self.last_alive = time.monotonic()
+        return True
+
+    @staticmethod
+    def connection_dead(connection):
+        """
+        True when the driver already knows the connection is gone. pyodbc has no SQLGetConnectAttr, so
+        SQL_ATTR_CONNECTION_DEAD is only read from connection objects that expose get_attr().
+        """
+        if getattr(connection, 'closed', False):
+            return True
+        get_attr = getattr(connection, 'get_attr', None)
+        if get_attr is None:
+            return False
+        try:
+            return get_attr(SQL_ATTR_CONNECTION_DEAD) == SQL_CD_TRUE
+        except Database.Error:
+            return False
+
+    @staticmethod
+    def probe_connection(connection):
+        try:
+            cursor = connection.cursor()
+            cursor.execute(LIVENESS_PROBE_SQL)
+            cursor.fetchone()
+            cursor.close()
+        except Database.Error:
+            return False
+        return True
+
+    def liveness_stats(self):
+        return {
+            'probes': self.liveness_probes,
+            'broken_connections_caught': self.broken_connections_caught,
+        }
 
     # Over-riding _cursor method to return DB2 cursor.
-    def _cursor(self, connection):
-        return DB2CursorWrapper(connection)
+    def _cursor(self, connection, name=None):
+        if name is not None:
+            return DB2StreamingCursorWrapper(connection, self)
+        return DB2CursorWrapper(connection, self)
 
     def close(self, connection):
+        if self.pool_entry is not None and self.pool_entry.connection is connection:
+            entry, self.pool_entry = self.pool_entry, None
+            entry.last_alive = self.last_alive
+            entry.current_schema = None if self.schema_changed else self.current_schema
+            self.statement_cache = self._new_statement_cache()
+            self.pool.checkin(entry, self.reset_session)
+            return
+        self.statement_cache.clear()
         try:
             connection.close()
         except ProgrammingError as e:
@@ -193,12 +409,225 @@ class DatabaseWrapper:
             else:
                 raise
 
+    def reset_session(self, connection):
+        """
+        Put a connection returned to the pool back into the state it was opened in.
+        Returns False when that is not possible and the connection must be closed instead.
+        """
+        connection.rollback()
+        connection.autocommit = False
+        for table in self.staged_tables:
+            try:
+                DB2CursorWrapper(connection).execute(f'DROP TABLE {table}')
+            except Database.Error:
+                pass
+        self.staged_tables.clear()
+        if self.schema_changed:
+            if not self.currentschema:
+                # the job's default schema was never recorded, so there is nothing to restore
+                return False
+            DB2CursorWrapper(connection).set_current_schema(self.currentschema)
+            self.schema_changed = False
+        return True
+
+    def pool_stats(self):
+        return self.pool.stats() if self.pool is not None else None
+
+    def _new_statement_cache(self):
+        return LRUCache(maxsize=self.statement_cache_size, on_evict=self._discard_statement)
+
+    def checkout_statement(self, connection, query):
+        """
+        Return the prepared statement cached for ``query``, creating it on first use.
+        None means the statement is already checked out by another open cursor.
+        """
+        statement = self.statement_cache.get(query)
+        if statement is None:
+            statement = PreparedStatement(connection.cursor())
+            self.statement_cache.put(query, statement)
+        elif statement.in_use:
+            return None
+        else:
+            self.prepares_avoided += 1
+        statement.in_use = True
+        return statement
+
+    def statement_cache_stats(self):
+        return dict(self.statement_cache.stats(), prepares_avoided=self.prepares_avoided)
+
+    @staticmethod
+    def _discard_statement(statement):
+        if statement.in_use:
+            # closed by the cursor wrapper that holds it once it is released
+            statement.evicted = True
+        else:
+            statement.close()
+
     def get_server_version(self, connection):
-        self.connection = connection
-        if not self.connection:
-            # pylint: disable=(no-member)
-            self.cursor()
-        return tuple(int(version) for version in self.connection.server_info()[1].split("."))
+        """IBM i release as a tuple, e.g. (7, 4, 0) for a DBMS version of '07.04.0000'"""
+        return tuple(int(part) for part in connection.getinfo(Database.SQL_DBMS_VER).split('.'))
+
+
+def select_marker_type(value):
+    """SQL type of the CAST(? AS <type>) marker binding ``value`` in a select clause, or None"""
+    if isinstance(value, bool):
+        return 'SMALLINT'
+    if isinstance(value, int):
+        return 'BIGINT' if -2 ** 63 <= value < 2 ** 63 else None
+    if isinstance(value, float):
+        return 'DOUBLE'
+    if isinstance(value, decimal.Decimal):
+        if not value.is_finite():
+            return None
+        _, digits, exponent = value.as_tuple()
+        scale = max(-exponent, 0)
+        if max(len(digits) + max(exponent, 0), scale) > MAX_DECIMAL_PRECISION:
+            return None
+        return f'DECIMAL({MAX_DECIMAL_PRECISION}, {scale})'
+    if isinstance(value, str):
+        length = _marker_length(len(value.encode()))
+        return f'VARCHAR({length}) CCSID 1208' if length else None
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        length = _marker_length(len(value))
+        return f'VARBINARY({length})' if length else None
+    if isinstance(value, datetime.datetime):
+        return 'TIMESTAMP'
+    if isinstance(value, datetime.date):
+        return 'DATE'
+    if isinstance(value, datetime.time):
+        return 'TIME'
+    return None
+
+
+def _marker_length(length):
+    if length > MAX_SELECT_MARKER_LENGTH:
+        return None
+    return min(max(MIN_SELECT_MARKER_LENGTH, 1 << (length - 1).bit_length()), MAX_SELECT_MARKER_LENGTH)
+
+
+def schema_name(identifier):
+    """Schema name an SQL identifier refers to: quoted names are taken as is, ordinary ones upper cased"""
+    if not identifier:
+        return None
+    if identifier.startswith('"') and identifier.endswith('"'):
+        return identifier[1:-1].replace('""', '"')
+    return identifier.upper()
+
+
+def qcmdexc_sql(command):
+    escaped = command.replace("'", "''")
+    return f"CALL QSYS2.QCMDEXC('{escaped}')"
+
+
+class ConnectionInitScript:
+    """
+    Session setup for new connections, compiled once per distinct list of steps into a single
+    dynamic compound statement.
+
+    Every step runs under its own CONTINUE handler that records the step number and SQLSTATE.
+    If anything failed, the statement ends with a SIGNAL carrying that list, so one round trip
+    still reports the outcome of each step. Hosts that reject dynamic compound statements fall
+    back to one statement per step.
+    """
+
+    _scripts = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def for_steps(cls, steps):
+        with cls._lock:
+            script = cls._scripts.get(steps)
+            if script is None:
+                script = cls._scripts[steps] = cls(steps)
+            return script
+
+    def __init__(self, steps):
+        self.steps = steps
+        self.use_compound = len(steps) > 1
+        self.sql = self._compile()
+
+    def _compile(self):
+        sql = ["BEGIN", "DECLARE SQLSTATE CHAR(5) DEFAULT '00000';", "DECLARE FAILED_STEPS VARCHAR(1000) DEFAULT '';"]
+        for step_number, (_label, statement) in enumerate(self.steps):
+            sql.append(
+                f"BEGIN DECLARE CONTINUE HANDLER FOR SQLEXCEPTION "
+                f"SET FAILED_STEPS = FAILED_STEPS CONCAT ' {step_number}=' CONCAT SQLSTATE; "
+                f"{statement}; END;"
+            )
+        sql.append(
+            f"IF FAILED_STEPS <> '' THEN SIGNAL SQLSTATE '{INIT_FAILED_SQLSTATE}' "
+            f"SET MESSAGE_TEXT = '{INIT_FAILED_MARKER}' CONCAT FAILED_STEPS; END IF;"
+        )
+        sql.append("END")
+        return '\n'.join(sql)
+
+    def run(self, cursor):
+        """Execute the steps; return a list of (label, error) with error None for every step that succeeded"""
+        if self.use_compound:
+            try:
+                cursor.execute(self.sql)
+            except Database.Error as e:
+                match = INIT_FAILED_REGEX.search(' '.join(str(arg) for arg in e.args))
+                if match is not None:
+                    failed = dict(INIT_FAILED_STEP_REGEX.findall(match.group(1)))
+                    return [
+                        (label, f'SQLSTATE {failed[str(step_number)]}' if str(step_number) in failed else None)
+                        for step_number, (label, _statement) in enumerate(self.steps)
+                    ]
+                # the host does not support dynamic compound statements
+                self.use_compound = False
+            else:
+                return [(label, None) for label, _statement in self.steps]
+
+        report = []
+        for label, statement in self.steps:
+            try:
+                cursor.execute(statement)
+            except Database.Error as e:
+                report.append((label, str(e)))
+            else:
+                report.append((label, None))
+        return report
+
+
+class PreparedStatement:
+    """A pyodbc cursor dedicated to one statement text, reused for as long as the connection lives."""
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+        self.in_use = False
+        self.evicted = False
+        self.input_types = []
+        self.input_sizes = None
+
+    def bind_input_types(self, params):
+        """
+        Keep parameter typing stable across executions: a None parameter is bound with the SQL type
+        of the last value seen at its position instead of letting the driver re-describe it.
+        """
+        if len(self.input_types) != len(params):
+            self.input_types = [None] * len(params)
+        input_sizes = []
+        for idx, value in enumerate(params):
+            if value is None:
+                input_sizes.append(self.input_types[idx])
+                continue
+            for python_type, sql_type in PARAMETER_SQL_TYPES:
+                if isinstance(value, python_type):
+                    self.input_types[idx] = sql_type
+                    break
+            input_sizes.append(None)
+        if not any(input_sizes):
+            input_sizes = None
+        if input_sizes != self.input_sizes:
+            self.cursor.setinputsizes(input_sizes)
+            self.input_sizes = input_sizes
+
+    def close(self):
+        try:
+            self.cursor.close()
+        except Database.Error:
+            pass
 
 
 class DB2CursorWrapper:
@@ -210,10 +639,24 @@ class DB2CursorWrapper:
     pyodbc.Cursor cannot be subclassed, so we store it as an attribute
     """
 
-    current_schema = None
+    statement = None
+    batch_rowcount = None
 
-    def __init__(self, connection):
+    def __init__(self, connection, wrapper=None):
         self.cursor: Database.Cursor = connection.cursor()
+        self.wrapper = wrapper
+        self.zero_copy_rows = wrapper is not None and wrapper.zero_copy_rows and wrapper.zero_copy_statement
+        self._connection = connection
+        self._own_cursor = self.cursor
+
+    def __del__(self):
+        self._release_statement()
+
+    @property
+    def rowcount(self):
+        if self.batch_rowcount is not None:
+            return self.batch_rowcount
+        return self.cursor.rowcount
 
     def __iter__(self):
         return self.cursor
@@ -222,14 +665,19 @@ class DB2CursorWrapper:
         return getattr(self.cursor, attr)
 
     def get_current_schema(self):
-        if self.current_schema is not None:
-            return self.current_schema.upper()
+        """CURRENT_SCHEMA, queried once per connection and cached on the connection wrapper"""
+        if self.wrapper is not None and self.wrapper.current_schema is not None:
+            return self.wrapper.current_schema.upper()
         self.execute('select CURRENT_SCHEMA from sysibm.sysdummy1')
-        self.current_schema = self.fetchone()[0]
-        return self.current_schema.upper()
+        current_schema = self.fetchone()[0]
+        if self.wrapper is not None:
+            self.wrapper.current_schema = current_schema
+        return current_schema.upper()
 
     def set_current_schema(self, schema):
         self.execute(f'SET CURRENT_SCHEMA = {schema}')
+        if self.wrapper is not None:
+            self.wrapper.current_schema = schema_name(schema)
 
     def close(self):
         """
@@ -239,13 +687,20 @@ class DB2CursorWrapper:
         In the unlikely event that this code prevents close() from being called, pyodbc will close
         the cursor automatically when it goes out of scope.
         """
+        self._release_statement()
         if getattr(self, 'connection', False):
             self.cursor.close()
 
     def execute(self, query, params = ()):
+        self._release_statement()
+        self.batch_rowcount = None
+        if self.wrapper is not None and SET_SCHEMA_REGEX.match(query):
+            # a raw SET SCHEMA; the new schema may be a host variable or expression, so just forget it
+            self.wrapper.current_schema = None
+            self.wrapper.schema_changed = True
         if params:
-            query = self.convert_query(query)
-            query, params = self._replace_placeholders_in_select_clause(params, query)
+            query, params = self._rewrite(query, params)
+            self._checkout_statement(query, params)
         result = self._wrap_execute(partial(self.cursor.execute, query, params))
         return result
 
@@ -253,10 +708,89 @@ class DB2CursorWrapper:
         if not param_list:
             # empty param_list means do nothing (execute the query zero times)
             return
+        self._release_statement()
+        self.batch_rowcount = None
         query = self.convert_query(query)
-        result = self._wrap_execute(partial(self.cursor.executemany, query, param_list))
-        return result
+        # this wrapper on both paths, like execute(), so rowcount is the total over all batches
+        if self.wrapper is None or not self.wrapper.fast_executemany:
+            self._wrap_execute(partial(self.cursor.executemany, query, param_list))
+            return self
 
+        param_list = list(param_list)
+        batch_rows = self._executemany_batch_rows(param_list)
+        self.cursor.fast_executemany = True
+        rowcount = 0
+        for start in range(0, len(param_list), batch_rows):
+            rowcount += self._executemany_batch(query, param_list[start:start + batch_rows], start)
+        self.batch_rowcount = rowcount
+        return self
+
+    def _executemany_batch_rows(self, param_list):
+        """
+        Rows per array-bound batch: pyodbc allocates each column's buffer for its widest value,
+        so the row width is the sum of the per-column maximums.
+        """
+        column_bytes = [DEFAULT_COLUMN_BYTES] * len(param_list[0])
+        for params in param_list:
+            for idx, value in enumerate(params):
+                if isinstance(value, str):
+                    size = 2 * len(value) + 2
+                elif isinstance(value, (bytes, bytearray, memoryview)):
+                    size = len(value)
+                else:
+                    continue
+                if size > column_bytes[idx]:
+                    column_bytes[idx] = size
+        return max(1, self.wrapper.executemany_memory_cap // max(sum(column_bytes), 1))
+
+    def _executemany_batch(self, query, batch, start):
+        """
+        Execute one array-bound batch. Inside a transaction a failed batch is rolled back to a
+        savepoint and replayed row by row, so the error raised is the offending row's own.
+        """
+        in_transaction = not self.cursor.connection.autocommit
+        if in_transaction:
+            self.cursor.execute(f'SAVEPOINT {EXECUTEMANY_SAVEPOINT} ON ROLLBACK RETAIN CURSORS')
+        try:
+            self._wrap_execute(partial(self.cursor.executemany, query, batch))
+        except (Database.Error, utils.Error):
+            if not in_transaction:
+                raise
+            self.cursor.execute(f'ROLLBACK TO SAVEPOINT {EXECUTEMANY_SAVEPOINT}')
+            rowcount = 0
+            for offset, params in enumerate(batch):
+                try:
+                    self._wrap_execute(partial(self.cursor.execute, query, params))
+                except (Database.Error, utils.Error) as e:
+                    e.args += (f'executemany row {start + offset}',)
+                    raise
+                rowcount += max(self.cursor.rowcount, 0)
+            return rowcount
+        rowcount = max(self.cursor.rowcount, 0)
+        if in_transaction:
+            self.cursor.execute(f'RELEASE TO SAVEPOINT {EXECUTEMANY_SAVEPOINT}')
+        return rowcount
+
+    def _checkout_statement(self, query, params):
+        """Run ``query`` on the connection's cached cursor for it, if the statement cache is enabled"""
+        if self.wrapper is None or self.wrapper.statement_cache.maxsize <= 0:
+            return
+        statement = self.wrapper.checkout_statement(self._connection, query)
+        if statement is None:
+            return
+        self.statement = statement
+        self.cursor = statement.cursor
+        statement.bind_input_types(params)
+
+    def _release_statement(self):
+        statement = self.statement
+        if statement is None:
+            return
+        self.statement = None
+        self.cursor = self._own_cursor
+        statement.in_use = False
+        if statement.evicted:
+            statement.close()
 
     # sumit execute sql here 
     def _wrap_execute(self, execute):
@@ -283,31 +817,82 @@ class DB2CursorWrapper:
             raise type(e)(*e.args, execute.func, execute.args)
         except Exception as e:
             pass
+        if self.wrapper is not None:
+            self.wrapper.last_alive = time.monotonic()
         if result == self.cursor:
             return self
         return result
 
+    def _rewrite(self, query, params):
+        """
+        Convert a Django statement for the driver, reusing the cached rewrite of the same SQL text
+        so that repeated statements skip the qmark conversion and the tokenizer entirely.
+        """
+        rewrite = rewrite_cache.get(query)
+        if rewrite is None:
+            rewrite = self._select_clause_rewrite(self.convert_query(query))
+            rewrite_cache.put(query, rewrite)
+        return self._apply_select_rewrite(rewrite, params)
+
     def _replace_placeholders_in_select_clause(self, params, query):
-        """Db2 for i does not allow placeholders in select clause; this converts them to literals"""
-        if isinstance(params, tuple):
-            params = list(params)
+        """Db2 for i does not allow untyped placeholders in a select clause; this casts them to a type"""
+        return self._apply_select_rewrite(self._select_clause_rewrite(query), params)
+
+    def _select_clause_rewrite(self, query):
+        """
+        Split a qmark query around the placeholders found in a select clause.
+
+        Single pass over the statement: quoted strings, quoted identifiers and comments are skipped,
+        every SELECT opens a select clause and every FROM closes it, which also covers subqueries.
+        Scanning stops as soon as a clause closes and no other SELECT follows it.
+        """
+        if '?' not in query:
+            return SelectRewrite((query,), ())
+        pieces = []
+        literal_positions = []
         current_param_idx = -1
         in_select_clause = False
-        tmp = []
-        parsed_statement = sqlparse.parse(query)[0]
-        for t in parsed_statement.flatten():
-            if t.ttype == sqlparse.tokens.Name.Placeholder:  # '?'
+        start = 0
+        for match in SELECT_CLAUSE_TOKEN_REGEX.finditer(query):
+            first_char = match.group()[0]
+            if first_char == '?':
                 current_param_idx += 1
                 if in_select_clause:
-                    quoted_val = self.quote_value(params.pop(current_param_idx))
-                    t = sqlparse.sql.Token(sqlparse.tokens.String, quoted_val)
-            elif t.normalized == 'SELECT':
+                    pieces.append(query[start:match.start()])
+                    literal_positions.append(current_param_idx)
+                    start = match.end()
+            elif first_char in 'Ss':
                 in_select_clause = True
-            elif t.normalized == 'FROM':
+            elif first_char in 'Ff':
                 in_select_clause = False
-            tmp.append(str(t))
-        query = ''.join(tmp)
-        return query, params
+                if SELECT_KEYWORD_REGEX.search(query, match.end()) is None:
+                    break
+        pieces.append(query[start:])
+        return SelectRewrite(tuple(pieces), tuple(literal_positions))
+
+    def _apply_select_rewrite(self, rewrite, params):
+        """
+        Fill the select clause gaps with CAST(? AS <type>) markers typed after the bound values, so
+        the statement stays parameterized. Values without a marker type (None, or too long or
+        precise for one) are inlined as literals.
+        """
+        pieces, literal_positions = rewrite
+        if not literal_positions:
+            return pieces[0], params
+        params = list(params)
+        tmp = [pieces[0]]
+        inlined = []
+        for param_idx, piece in zip(literal_positions, pieces[1:]):
+            marker_type = select_marker_type(params[param_idx])
+            if marker_type is None:
+                tmp.append(self.quote_value(params[param_idx]))
+                inlined.append(param_idx)
+            else:
+                tmp.append(f'CAST(? AS {marker_type})')
+            tmp.append(piece)
+        for param_idx in reversed(inlined):
+            del params[param_idx]
+        return ''.join(tmp), params
 
     def convert_query(self, query):
         """
@@ -323,12 +908,18 @@ class DB2CursorWrapper:
         return tuple(row)
 
     def fetchone(self):
+        if self.zero_copy_rows:
+            return self.cursor.fetchone()
         return self._row_factory(self.cursor.fetchone())
 
     def fetchmany(self, size):
+        if self.zero_copy_rows:
+            return self.cursor.fetchmany(size)
         return [self._row_factory(row) for row in self.cursor.fetchmany(size)]
 
     def fetchall(self):
+        if self.zero_copy_rows:
+            return self.cursor.fetchall()
         return [self._row_factory(row) for row in self.cursor.fetchall()]
 
     @property
@@ -338,8 +929,59 @@ class DB2CursorWrapper:
         return row[0]
 
     def quote_value(self, value):
+        if value is None:
+            return 'NULL'
         if isinstance(value, (datetime.datetime, datetime.date, datetime.time, str)):
-            return f"'{value}'"
+            return "'%s'" % str(value).replace("'", "''")
         if isinstance(value, bool):
             return '1' if value else '0'
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return f"BX'{bytes(value).hex().upper()}'"
         return str(value)
+
+
+class DB2StreamingCursorWrapper(DB2CursorWrapper):
+    """
+    Cursor returned by DatabaseWrapper.chunked_cursor() for QuerySet.iterator().
+
+    fetchmany() never returns more than one block of rows: the requested chunk_size, capped by the
+    number of rows of the result's width that fit in the connection's BLOCKSIZE. The driver's
+    arraysize is set to the same number so each call maps onto a single block fetch from the host.
+    """
+
+    def __init__(self, connection, wrapper=None):
+        super().__init__(connection, wrapper)
+        self.block_bytes = wrapper.stream_block_bytes if wrapper is not None else DEFAULT_BLOCKSIZE_KB * 1024
+        self.block_rows = None
+
+    def execute(self, query, params = ()):
+        self.block_rows = None
+        return super().execute(query, params)
+
+    def fetchmany(self, size=None):
+        return super().fetchmany(self._block_size(size))
+
+    def fetchall(self):
+        rows = []
+        while True:
+            block = self.fetchmany()
+            if not block:
+                return rows
+            rows.extend(block)
+
+    def _block_size(self, size):
+        if self.block_rows is None:
+            self.block_rows = max(1, self.block_bytes // self._row_width())
+        if size:
+            self.block_rows = min(self.block_rows, size)
+        if self.cursor.arraysize != self.block_rows:
+            self.cursor.arraysize = self.block_rows
+        return self.block_rows
+
+    def _row_width(self):
+        width = 0
+        for column in self.cursor.description or ():
+            _name, _type_code, display_size, internal_size, *_ = column
+            column_bytes = internal_size or display_size or DEFAULT_COLUMN_BYTES
+            width += min(column_bytes, MAX_COLUMN_BYTES)
+        return max(width, 1)
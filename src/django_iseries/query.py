@@ -21,79 +21,59 @@ Custom Query class for DB2.
 Derives from: django.db.models.sql.query.Query
 """
 
+from django.db import models
+
+
+ROWNUM = '"__ROWNUM"'
+
+
+def row_number_pagination_sql(sql, columns, low_mark, high_mark, ordered):
+    """
+    Slice a compiled query with ROW_NUMBER() for releases without OFFSET/FETCH FIRST.
+
+    ``sql`` must give every selected column an alias; ``columns`` are those aliases, quoted.
+    Rows are numbered in the order of the inner query (ORDER OF), so the slice follows its ORDER BY.
+    """
+    select_list = ', '.join(f'M.{column}' for column in columns)
+    window = 'ORDER BY ORDER OF Z' if ordered else ''
+    conditions = []
+    if low_mark:
+        conditions.append(f'M.{ROWNUM} > {low_mark:d}')
+    if high_mark is not None:
+        conditions.append(f'M.{ROWNUM} <= {high_mark:d}')
+    return (
+        f'SELECT {select_list} FROM '
+        f'(SELECT Z.*, ROW_NUMBER() OVER({window}) AS {ROWNUM} FROM ({sql}) Z) M '
+        f'WHERE {" AND ".join(conditions)} ORDER BY M.{ROWNUM}'
+    )
+
+
+def optimize_for(queryset, rows):
+    """
+    ``queryset`` with OPTIMIZE FOR ``rows`` ROWS, telling the optimizer how many rows will actually
+    be fetched; None falls back to the slice or iterator() chunk size.
+    """
+    if rows is not None and (not isinstance(rows, int) or rows < 1):
+        raise ValueError(f'OPTIMIZE FOR needs a positive number of rows, not {rows!r}')
+    queryset = queryset.all()
+    queryset.query.optimize_rows = rows
+    return queryset
+
+
+class OptimizeForQuerySetMixin:
+    def optimize_for(self, rows):
+        return optimize_for(self, rows)
+
+
+class OptimizeForQuerySet(OptimizeForQuerySetMixin, models.QuerySet):
+    pass
+
+
+OptimizeForManager = models.Manager.from_queryset(OptimizeForQuerySet)
+
 
 def query_class(QueryClass):
     class DB2QueryClass(QueryClass):
-        __rownum = 'Z.__ROWNUM'
-
-        # To get ride of LIMIT/OFFSET problem in DB2, this method has been implemented.
-        def as_sql(self, with_limits=True, with_col_aliases=False):
-            if not (with_limits and (self.high_mark is not None or self.low_mark)):
-                return super(DB2QueryClass, self).as_sql(False, with_col_aliases)
-            else:
-                if self.high_mark == self.low_mark:
-                    return '', ()
-
-                sql_ori, params = super(DB2QueryClass, self).as_sql(False, with_col_aliases)
-                sql_split = sql_ori.split(" FROM ")
-
-                sql_sec = ""
-                if len(sql_split) > 2:
-                    for i in range(1, len(sql_split)):
-                        sql_sec = " %s FROM %s " % (sql_sec, sql_split[i])
-                else:
-                    sql_sec = " FROM %s " % (sql_split[1])
-
-                dummyVal = "Z.__db2_"
-                sql_pri = ""
-
-                sql_sel = "SELECT"
-                if self.distinct:
-                    sql_sel = "SELECT DISTINCT"
-
-                sql_select_token = sql_split[0].split(",")
-                i = 0
-                while (i < len(sql_select_token)):
-                    if sql_select_token[i].count("TIMESTAMP(DATE(SUBSTR(CHAR(") == 1:
-                        sql_sel = "%s \"%s%d\"," % (sql_sel, dummyVal, i + 1)
-                        sql_pri = '%s %s,%s,%s,%s AS "%s%d",' % (
-                            sql_pri,
-                            sql_select_token[i],
-                            sql_select_token[i + 1],
-                            sql_select_token[i + 2],
-                            sql_select_token[i + 3],
-                            dummyVal, i + 1)
-                        i = i + 4
-                        continue
-
-                    if sql_select_token[i].count(" AS ") == 1:
-                        temp_col_alias = sql_select_token[i].split(" AS ")
-                        sql_pri = '%s %s,' % (sql_pri, sql_select_token[i])
-                        sql_sel = "%s %s," % (sql_sel, temp_col_alias[1])
-                        i = i + 1
-                        continue
-
-                    sql_pri = '%s %s AS "%s%d",' % (sql_pri, sql_select_token[i], dummyVal, i + 1)
-                    sql_sel = "%s \"%s%d\"," % (sql_sel, dummyVal, i + 1)
-                    i = i + 1
-
-                sql_pri = sql_pri[:len(sql_pri) - 1]
-                sql_pri = "%s%s" % (sql_pri, sql_sec)
-                sql_sel = sql_sel[:len(sql_sel) - 1]
-                sql = '%s, ( ROW_NUMBER() OVER() ) AS "%s" FROM ( %s ) AS M' % (sql_sel, self.__rownum, sql_pri)
-                sql = '%s FROM ( %s ) Z WHERE' % (sql_sel, sql)
-
-                if self.low_mark != 0:
-                    sql = '%s "%s" > %d' % (sql, self.__rownum, self.low_mark)
-
-                if self.low_mark != 0 and self.high_mark is not None:
-                    sql = '%s AND ' % (sql)
-
-                if self.high_mark is not None:
-                    sql = '%s "%s" <= %d' % (sql, self.__rownum, self.high_mark)
-
-            return sql, params
-
         # http://www.python.org/dev/peps/pep-0307/
         # See Extended __reduce__ API
         def __reduce__(self):
@@ -0,0 +1,167 @@
+"""
+Parallel table scans split on relative record numbers.
+
+    for order in parallel_scan(Order.objects.filter(status='OPEN'), workers=8):
+        ...
+
+The table's RRN range is split into ranges that are read concurrently, each on its own connection
+(Django connections are per thread, and pyodbc releases the GIL while the driver fetches). Rows come
+back as one stream, either in RRN order or in whatever order ranges deliver them. Workers use their
+own connections, so they do not see uncommitted changes of the calling thread.
+"""
+
+import math
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connections
+from django.db.models import Func, IntegerField
+
+# Alias of the RRN annotation ranges are filtered (and, for ordered scans, sorted) on
+RRN_ALIAS = '_iseries_rrn'
+# Ranges per worker: more, smaller ranges keep all workers busy when rows are unevenly spread
+RANGES_PER_WORKER = 4
+
+
+class RRN(Func):
+    """Relative record number of the queryset's base table row"""
+    output_field = IntegerField()
+
+    def as_sql(self, compiler, connection, **extra_context):
+        alias = compiler.query.get_initial_alias()
+        return f'RRN({compiler.quote_name_unless_alias(alias)})', []
+
+
+def rrn_upper_bound(queryset):
+    """
+    Highest RRN the table can hold rows at: active plus deleted rows from the catalog, which is
+    cheap, or MAX(RRN()) when the catalog has no statistics for the table (e.g. it is a view).
+    """
+    connection = connections[queryset.db]
+    qn = connection.ops.quote_name
+    table = queryset.model._meta.db_table
+    schema, _, name = table.rpartition('.')
+    with connection.cursor() as cursor:
+        schema = schema.strip('"').upper() if schema else cursor.get_current_schema()
+        cursor.execute(
+            'SELECT SUM(NUMBER_ROWS + NUMBER_DELETED_ROWS) FROM QSYS2.SYSPARTITIONSTAT '
+            'WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s',
+            [schema, name.strip('"').upper()]
+        )
+        upper = cursor.fetchone()[0]
+        if upper is None:
+            cursor.execute(f'SELECT MAX(RRN(T)) FROM {qn(table)} T')
+            upper = cursor.fetchone()[0]
+    return int(upper or 0)
+
+
+def rrn_ranges(upper, count):
+    """``count`` (low, high) RRN ranges covering 1..upper; the last one is open ended (high None)"""
+    count = max(min(count, upper), 1)
+    step = math.ceil(upper / count) if upper else 1
+    count = max(math.ceil(upper / step), 1)
+    ranges = [(1 + i * step, (i + 1) * step) for i in range(count)]
+    ranges[-1] = (ranges[-1][0], None)
+    return ranges
+
+
+def parallel_scan(queryset, workers=4, *, ordered=False, ranges=None, chunk_size=2000, buffer=4):
+    """
+    Yield the rows of ``queryset``, scanning RRN ranges on up to ``workers`` connections at once.
+
+    ``ordered`` yields rows in RRN order (each range is sorted on RRN); otherwise rows are yielded
+    as soon as any range delivers them and the queryset's own ordering is dropped. ``ranges``
+    defaults to RANGES_PER_WORKER per worker; every worker buffers at most ``buffer`` chunks of
+    ``chunk_size`` rows that have not been consumed yet.
+    """
+    upper = rrn_upper_bound(queryset)
+    if ranges is None:
+        ranges = workers * RANGES_PER_WORKER
+    queryset = queryset.alias(**{RRN_ALIAS: RRN()})
+    queryset = queryset.order_by(RRN_ALIAS) if ordered else queryset.order_by()
+    range_querysets = []
+    for low, high in rrn_ranges(upper, ranges):
+        range_queryset = queryset.filter(**{f'{RRN_ALIAS}__gte': low})
+        if high is not None:
+            range_queryset = range_queryset.filter(**{f'{RRN_ALIAS}__lte': high})
+        range_querysets.append(range_queryset)
+
+    stop = threading.Event()
+    if ordered:
+        queues = [queue.Queue(maxsize=buffer) for _ in range_querysets]
+    else:
+        queues = [queue.Queue(maxsize=buffer * workers)] * len(range_querysets)
+
+    # workers take ranges in order, so the range an ordered scan waits for is always being read
+    work = queue.Queue()
+    for item in zip(range_querysets, queues):
+        work.put(item)
+    workers = min(workers, len(range_querysets))
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='iseries-scan')
+    try:
+        for _ in range(workers):
+            executor.submit(_scan_ranges, work, chunk_size, stop)
+        if ordered:
+            for range_queue in queues:
+                yield from _drain(range_queue, 1)
+        else:
+            yield from _drain(queues[0], len(range_querysets))
+    finally:
+        stop.set()
+        executor.shutdown(wait=True)
+
+
+def _drain(range_queue, ranges):
+    """Yield rows from ``range_queue`` until ``ranges`` ranges have reported completion"""
+    while ranges:
+        chunk = range_queue.get()
+        if chunk is None:
+            ranges -= 1
+        elif isinstance(chunk, BaseException):
+            raise chunk
+        else:
+            yield from chunk
+
+
+def _scan_ranges(work, chunk_size, stop):
+    """Worker: read ranges until there are none left, on one connection that is closed at the end"""
+    using = None
+    try:
+        while not stop.is_set():
+            try:
+                queryset, range_queue = work.get_nowait()
+            except queue.Empty:
+                return
+            using = queryset.db
+            _scan_range(queryset, chunk_size, range_queue, stop)
+    finally:
+        if using is not None:
+            connections[using].close()
+
+
+def _scan_range(queryset, chunk_size, range_queue, stop):
+    try:
+        chunk = []
+        for row in queryset.iterator(chunk_size=chunk_size):
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                if not _put(range_queue, chunk, stop):
+                    return
+                chunk = []
+        if chunk and not _put(range_queue, chunk, stop):
+            return
+        _put(range_queue, None, stop)
+    except Exception as e:
+        _put(range_queue, e, stop)
+
+
+def _put(range_queue, item, stop):
+    """Queue ``item`` unless the consumer went away; returns whether it was queued"""
+    while not stop.is_set():
+        try:
+            range_queue.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            pass
+    return False
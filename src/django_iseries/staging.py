@@ -0,0 +1,100 @@
+"""
+QTEMP staging of large IN lists.
+
+    Order.objects.filter(customer_id__in=customer_ids)    # 200,000 ids
+
+binds one parameter marker per value up to the 'IN_LIST_STAGING_THRESHOLD' database setting (default
+4096 values, None or 0 never stages). Longer lists are array-inserted into a declared global
+temporary table, which lives in the job's QTEMP library, and the predicate becomes
+
+    EXISTS (SELECT 1 FROM SESSION.ISERIES_KEYS_0 K WHERE K.SET_ID = ? AND K.KEY_VALUE = "ORDER"."CUSTOMER_ID")
+
+prefetch_related() filters on the parent keys with __in, so large prefetches are staged as well.
+Tables are declared WITH REPLACE while a statement is compiled for execution, and dropped once it has
+run, or once an iterator() has read its last row. Compiling without executing (str(queryset.query))
+keeps the IN list. Rows are not logged and survive a rollback, so staging also works under commitment
+control; a pooled connection drops any table a failed statement left behind before it is reused.
+"""
+
+from django.db import DatabaseError
+from django.db.models.expressions import Col
+
+STAGING_TABLE = 'SESSION.ISERIES_KEYS_{:d}'
+DEFAULT_STAGING_THRESHOLD = 4096
+DECLARE_STAGING_TABLE = (
+    'DECLARE GLOBAL TEMPORARY TABLE {table} (SET_ID INTEGER NOT NULL, KEY_VALUE {key_type}) '
+    'WITH REPLACE ON COMMIT PRESERVE ROWS NOT LOGGED ON ROLLBACK PRESERVE ROWS'
+)
+
+
+def staging_threshold(connection):
+    threshold = connection.settings_dict.get('IN_LIST_STAGING_THRESHOLD', DEFAULT_STAGING_THRESHOLD)
+    return int(threshold) if threshold else None
+
+
+class KeyStaging:
+    """Key sets loaded for one statement: a table per key column type, a SET_ID per IN list"""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.tables = {}
+        self.sets = 0
+
+    def stage(self, key_type, values):
+        """Load ``values`` as a new key set; returns (table, set id)"""
+        # tables of a statement whose rows are still being read are in use
+        in_use = self.connection.databaseWrapper.staged_tables
+        set_id = self.sets
+        self.sets += 1
+        with self.connection.cursor() as cursor:
+            table = self.tables.get(key_type)
+            if table is None:
+                table = next(STAGING_TABLE.format(i) for i in range(len(in_use) + 1)
+                             if STAGING_TABLE.format(i) not in in_use)
+                cursor.execute(DECLARE_STAGING_TABLE.format(table=table, key_type=key_type))
+                self.tables[key_type] = table
+                in_use.add(table)
+            cursor.executemany(
+                f'INSERT INTO {table} (SET_ID, KEY_VALUE) VALUES (%s, %s)', [(set_id, value) for value in values]
+            )
+        return table, set_id
+
+    def drop(self):
+        staged_tables = self.connection.databaseWrapper.staged_tables
+        with self.connection.cursor() as cursor:
+            for table in self.tables.values():
+                try:
+                    cursor.execute(f'DROP TABLE {table}')
+                except DatabaseError:
+                    # declared in a unit of work that was rolled back, which dropped it already
+                    pass
+                staged_tables.discard(table)
+        self.tables.clear()
+
+    def drop_after(self, rows):
+        """``rows`` of a chunked read, dropping the tables once they are exhausted or closed"""
+        try:
+            yield from rows
+        finally:
+            self.drop()
+
+
+def staged_in_sql(compiler, node):
+    """
+    (sql, params) of an IN lookup over more plain values than the staging threshold, as EXISTS
+    against the staged key set. None outside statement execution, or when the lookup is not a column
+    compared with a plain value list.
+    """
+    staging = compiler.connection.key_staging
+    threshold = staging_threshold(compiler.connection)
+    if staging is None or not threshold or not isinstance(node.lhs, Col) or not node.rhs_is_direct_value():
+        return None
+    if len(node.rhs) <= threshold:
+        return None
+    rhs_sql, values = node.process_rhs(compiler, compiler.connection)
+    if rhs_sql != '(%s)' % ', '.join(['%s'] * len(values)):
+        return None
+    lhs_sql, lhs_params = node.process_lhs(compiler, compiler.connection)
+    table, set_id = staging.stage(node.lhs.output_field.cast_db_type(compiler.connection), values)
+    sql = f'EXISTS (SELECT 1 FROM {table} K WHERE K.SET_ID = %s AND K.KEY_VALUE = {lhs_sql})'
+    return sql, [set_id, *lhs_params]
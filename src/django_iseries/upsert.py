@@ -0,0 +1,70 @@
+"""
+Bulk upserts compiled to MERGE.
+
+    class Price(models.Model):
+        objects = UpsertManager()
+
+    Price.objects.bulk_upsert(prices, match_fields=['sku', 'currency'])
+
+runs one statement per batch:
+
+    MERGE INTO "PRICE" AS T USING (VALUES (CAST(? AS VARCHAR(20) CCSID 1208), ...), ...) AS S (...)
+        ON T."SKU" = S."SKU" AND T."CURRENCY" = S."CURRENCY"
+        WHEN MATCHED THEN UPDATE SET ... WHEN NOT MATCHED THEN INSERT (...) VALUES (...)
+
+instead of the two or three round trips of update_or_create() per row. It is bulk_create() with
+update_conflicts=True, which can be called directly as well; bulk_upsert() adds the defaults (match on
+the primary key, update every other column) and accepts a ``CompositeKey`` as a match field. Match
+fields should be covered by a unique constraint: a source row matching several target rows fails the
+MERGE. Identity values of inserted and updated rows alike are set on the objects, read through
+SELECT ... FROM FINAL TABLE.
+"""
+
+from django.db import connections, models
+
+from django_iseries.compositeKey import CompositeKey
+
+
+def upsert_fields(opts, match_fields=None, update_fields=None):
+    """(match field names, update field names) of a bulk_upsert() with CompositeKeys expanded"""
+    match = []
+    for name in match_fields or ['pk']:
+        field = opts.pk if name == 'pk' else opts.get_field(name)
+        if isinstance(field, CompositeKey):
+            match.extend(opts.get_field(column) for column in field.columns)
+        else:
+            match.append(field)
+    if update_fields is None:
+        update_fields = [
+            field.name for field in opts.concrete_fields
+            if not field.primary_key and field not in match and not getattr(field, 'generated', False)
+        ]
+    return [field.name for field in match], list(update_fields)
+
+
+def bulk_upsert(queryset, objs, match_fields=None, update_fields=None, batch_size=None):
+    """
+    Insert ``objs``, updating ``update_fields`` (default: all but the primary and match keys) of the
+    rows whose ``match_fields`` (default: the primary key) already exist; returns ``objs``.
+    """
+    opts = queryset.model._meta
+    match_fields, update_fields = upsert_fields(opts, match_fields, update_fields)
+    # bulk_create() sizes batches for plain INSERTs; MERGE rows CAST every marker
+    max_batch_size = connections[queryset.db].ops.merge_batch_size(opts.concrete_fields)
+    batch_size = min(batch_size, max_batch_size) if batch_size else max_batch_size
+    return queryset.bulk_create(
+        objs, batch_size=batch_size, update_conflicts=True,
+        update_fields=update_fields, unique_fields=match_fields,
+    )
+
+
+class UpsertQuerySetMixin:
+    def bulk_upsert(self, objs, match_fields=None, update_fields=None, batch_size=None):
+        return bulk_upsert(self, objs, match_fields, update_fields, batch_size)
+
+
+class UpsertQuerySet(UpsertQuerySetMixin, models.QuerySet):
+    pass
+
+
+UpsertManager = models.Manager.from_queryset(UpsertQuerySet)
@@ -5,6 +5,8 @@ from django.contrib.contenttypes.fields import (
 from django.contrib.contenttypes.models import ContentType
 from django.db import models
 
+from django_iseries.compositeKey import CompositeKey
+
 
 class Square(models.Model):
     root = models.IntegerField()
@@ -88,6 +90,21 @@ class Item(models.Model):
         return self.name
 
 
+class StockLevel(models.Model):
+    id = CompositeKey(columns=['warehouse', 'sku'])
+    warehouse = models.CharField(max_length=10)
+    sku = models.CharField(max_length=20)
+    quantity = models.IntegerField()
+
+
+class Parent(models.Model):
+    name = models.CharField(max_length=30)
+
+
+class Child(Parent):
+    age = models.IntegerField()
+
+
 class Object(models.Model):
     related_objects = models.ManyToManyField("self", db_constraint=False, symmetrical=False)
 
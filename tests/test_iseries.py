@@ -1,3 +1,6 @@
+import datetime
+import decimal
+
 import pytest
 from django.core.exceptions import ImproperlyConfigured
 
@@ -76,3 +79,1143 @@ class DBConstraintTests:
         intermediary_model.objects.create(from_object_id=obj.id, to_object_id=12345)
         assert obj.related_objects.count() == 1
         assert intermediary_model.objects.count() == 2
+
+
+def test_lru_cache_evicts_least_recently_used():
+    from django_iseries.caches import LRUCache
+    evicted = []
+    cache = LRUCache(maxsize=2, on_evict=evicted.append)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+    assert 'b' not in cache
+    assert evicted == [2]
+    assert cache.get('b') is None
+    assert cache.stats() == {'hits': 1, 'misses': 1, 'evictions': 1, 'size': 2, 'maxsize': 2}
+
+
+# noinspection PyProtectedMember
+def test_select_clause_rewrite_is_cached(monkeypatch):
+    from django_iseries import pybase
+    cursor = pybase.DB2CursorWrapper.__new__(pybase.DB2CursorWrapper)
+    query = 'SELECT %s AS "A", %s AS "B" FROM "T" WHERE "C" = %s -- test_select_clause_rewrite_is_cached'
+    select = 'SELECT CAST(? AS VARCHAR(32) CCSID 1208) AS "A", CAST(? AS BIGINT) AS "B" FROM "T" WHERE "C" = ?'
+    assert cursor._rewrite(query, ('x', 1, 2)) == (
+        select + ' -- test_select_clause_rewrite_is_cached', ['x', 1, 2]
+    )
+
+    def fail(*args):
+        raise AssertionError('cached statement was tokenized again')
+
+    monkeypatch.setattr(pybase.DB2CursorWrapper, '_select_clause_rewrite', fail)
+    hits = pybase.rewrite_cache.hits
+    assert cursor._rewrite(query, ('y', 3, 4)) == (
+        select + ' -- test_select_clause_rewrite_is_cached', ['y', 3, 4]
+    )
+    assert pybase.rewrite_cache.hits == hits + 1
+
+
+@pytest.mark.parametrize('value,marker', [
+    (True, 'CAST(? AS SMALLINT)'),
+    (42, 'CAST(? AS BIGINT)'),
+    (1.5, 'CAST(? AS DOUBLE)'),
+    (decimal.Decimal('12.340'), 'CAST(? AS DECIMAL(63, 3))'),
+    ('é' * 40, 'CAST(? AS VARCHAR(128) CCSID 1208)'),
+    (b'\x00\x01', 'CAST(? AS VARBINARY(32))'),
+    (datetime.datetime(2024, 1, 2, 3, 4, 5), 'CAST(? AS TIMESTAMP)'),
+    (datetime.date(2024, 1, 2), 'CAST(? AS DATE)'),
+    (None, 'NULL'),
+    (2 ** 70, str(2 ** 70)),
+    ("it's" + ' ' * 40000, "'it''s" + ' ' * 40000 + "'"),
+])
+def test_select_clause_markers_are_typed(value, marker):
+    from django_iseries import pybase
+    cursor = pybase.DB2CursorWrapper.__new__(pybase.DB2CursorWrapper)
+    sql, params = cursor._rewrite('SELECT %s AS "A" FROM "T" WHERE "C" = %s', (value, 1))
+    assert sql == f'SELECT {marker} AS "A" FROM "T" WHERE "C" = ?'
+    assert params == ([value, 1] if marker.startswith('CAST') else [1])
+
+
+def test_zero_copy_rows_returns_driver_rows():
+    from django_iseries import pybase
+
+    class FakeCursor:
+        rows = [[1, 'a'], [2, 'b']]
+
+        def fetchall(self):
+            return self.rows
+
+    class FakeConnection:
+        def cursor(self):
+            return FakeCursor()
+
+    wrapper = pybase.DatabaseWrapper({'ZERO_COPY_ROWS': True})
+    # only cursors of compiler statements whose rows are indexed skip the copy
+    assert wrapper._cursor(FakeConnection()).fetchall() == [(1, 'a'), (2, 'b')]
+    wrapper.zero_copy_statement = True
+    assert wrapper._cursor(FakeConnection()).fetchall() is FakeCursor.rows
+    wrapper.zero_copy_rows = False
+    assert wrapper._cursor(FakeConnection()).fetchall() == [(1, 'a'), (2, 'b')]
+
+
+def test_zero_copy_rows_keeps_values_list_tuples(connection, monkeypatch):
+    from tests.models import Person
+
+    class FakeCursor:
+        description = None
+
+        def __init__(self):
+            self.rows = [[1, 'Ada', 'L']]
+
+        def execute(self, sql, *params):
+            return self
+
+        def fetchmany(self, size):
+            rows, self.rows = self.rows, []
+            return rows
+
+        def close(self):
+            pass
+
+    class FakeConnection:
+        def cursor(self):
+            return FakeCursor()
+
+    monkeypatch.setattr(connection, 'cursor', lambda: connection.databaseWrapper._cursor(FakeConnection()))
+    connection.databaseWrapper.zero_copy_rows = True
+
+    def rows(queryset, **kwargs):
+        return list(queryset.query.get_compiler(connection=connection).results_iter(**kwargs))
+
+    assert rows(Person.objects.values_list('id', 'first_name', 'last_name'), tuple_expected=True) == [(1, 'Ada', 'L')]
+    assert rows(Person.objects.all()) == [[1, 'Ada', 'L']]
+
+
+def test_streaming_cursor_fetches_one_block():
+    from django_iseries import pybase
+
+    class FakeCursor:
+        arraysize = 1
+        # 100-byte rows
+        description = [('ID', int, 10, 4, 10, 0, False), ('NAME', str, 96, 96, 96, 0, True)]
+
+        def __init__(self):
+            self.rows = [(i, 'x') for i in range(25)]
+
+        def fetchmany(self, size):
+            rows, self.rows = self.rows[:size], self.rows[size:]
+            return rows
+
+    class FakeConnection:
+        def cursor(self):
+            return FakeCursor()
+
+    wrapper = pybase.DatabaseWrapper({'BLOCKSIZE': 1})
+    cursor = wrapper._cursor(FakeConnection(), name='stream')
+    assert [len(cursor.fetchmany(2000)) for _ in range(4)] == [10, 10, 5, 0]
+    assert cursor.cursor.arraysize == 10
+    assert len(wrapper._cursor(FakeConnection(), name='stream').fetchmany(4)) == 4
+
+
+def test_statement_cache_reuses_prepared_cursor():
+    from django_iseries import pybase
+
+    class FakeCursor:
+        def __init__(self):
+            self.input_sizes = []
+
+        def execute(self, query, params):
+            return self
+
+        def setinputsizes(self, sizes):
+            self.input_sizes.append(sizes)
+
+        def close(self):
+            pass
+
+    class FakeConnection:
+        def cursor(self):
+            return FakeCursor()
+
+    connection = FakeConnection()
+    wrapper = pybase.DatabaseWrapper({'STATEMENT_CACHE_SIZE': 2})
+    query = 'UPDATE "T" SET "A" = %s WHERE "B" = %s'
+
+    first = wrapper._cursor(connection)
+    first.execute(query, ['x', 1])
+    prepared = first.cursor
+    first.close()
+
+    second = wrapper._cursor(connection)
+    second.execute(query, [None, 2])
+    assert second.cursor is prepared
+    assert prepared.input_sizes == [[pybase.Database.SQL_WVARCHAR, None]]
+
+    # the statement is still checked out by ``second``, so a concurrent cursor prepares its own
+    third = wrapper._cursor(connection)
+    third.execute(query, ['y', 3])
+    assert third.cursor is not prepared
+    assert wrapper.statement_cache_stats()['prepares_avoided'] == 1
+
+
+def test_executemany_batches_and_replays_failed_batch():
+    from django_iseries import pybase
+
+    class FakeConnection:
+        autocommit = False
+
+        def __init__(self):
+            self.statements = []
+
+        def cursor(self):
+            return FakeCursor(self)
+
+    class FakeCursor:
+        rowcount = -1
+
+        def __init__(self, connection):
+            self.connection = connection
+
+        def executemany(self, query, batch):
+            self.connection.statements.append(('executemany', len(batch)))
+            if any(params[0] == 'bad' for params in batch):
+                raise pybase.Database.IntegrityError('23505', 'duplicate key')
+            self.rowcount = len(batch)
+
+        def execute(self, query, params=()):
+            self.connection.statements.append(query if not params else ('execute', params[0]))
+            if params and params[0] == 'bad':
+                raise pybase.Database.IntegrityError('23505', 'duplicate key')
+            self.rowcount = 1 if params else -1
+
+    connection = FakeConnection()
+    # 4 rows per batch: a one-character column still counts for the 16 byte minimum
+    wrapper = pybase.DatabaseWrapper({'EXECUTEMANY_MEMORY_CAP': 64})
+    cursor = wrapper._cursor(connection)
+    assert cursor.executemany('INSERT INTO "T" ("A") VALUES (%s)', [('a',)] * 6) is cursor
+    assert cursor.rowcount == 6
+    assert [s for s in connection.statements if isinstance(s, tuple)] == [('executemany', 4), ('executemany', 2)]
+
+    connection.statements = []
+    with pytest.raises(pybase.Database.IntegrityError) as excinfo:
+        cursor.executemany('INSERT INTO "T" ("A") VALUES (%s)', [('a',), ('a',), ('a',), ('a',), ('b',), ('bad',)])
+    assert excinfo.value.args[-1] == 'executemany row 5'
+    assert connection.statements[-4:] == [
+        ('executemany', 2),
+        'ROLLBACK TO SAVEPOINT DJANGO_ISERIES_EXECUTEMANY',
+        ('execute', 'b'),
+        ('execute', 'bad'),
+    ]
+
+
+def test_connection_init_script_reports_each_step():
+    from django_iseries import pybase
+
+    steps = pybase.DatabaseWrapper.connection_init_steps([(1, 'CPA32B2', 'I')], ['CALL APPLIB.SESSION_SETUP()'])
+    script = pybase.ConnectionInitScript.for_steps(steps)
+    assert script is pybase.ConnectionInitScript.for_steps(steps)
+
+    class FakeCursor:
+        def __init__(self, error_text):
+            self.executed = []
+            self.error_text = error_text
+
+        def execute(self, sql):
+            self.executed.append(sql)
+            if self.error_text:
+                raise pybase.Database.Error('75001', self.error_text)
+
+    cursor = FakeCursor('[IBM][System i Access ODBC Driver]DJANGO_ISERIES_INIT_FAILED: 0=38501')
+    assert script.run(cursor) == [
+        ('ADDRPYLE SEQNBR(1) MSGID(CPA32B2) RPY(I)', 'SQLSTATE 38501'),
+        ('CHGJOB INQMSGRPY(*SYSRPYL)', None),
+        ('CALL APPLIB.SESSION_SETUP()', None),
+    ]
+    assert cursor.executed == [script.sql]
+
+    cursor = FakeCursor(None)
+    assert all(error is None for _label, error in script.run(cursor))
+    assert len(cursor.executed) == 1
+
+
+def test_connection_pool_reuses_and_resets_connections(monkeypatch):
+    from django.db import utils
+    from django_iseries import pool as pool_module
+
+    class FakeConnection:
+        def __init__(self):
+            self.autocommit = False
+            self.rolled_back = 0
+            self.closed = False
+
+        def rollback(self):
+            self.rolled_back += 1
+
+        def close(self):
+            self.closed = True
+
+    opened = []
+
+    def connect():
+        opened.append(FakeConnection())
+        return opened[-1], []
+
+    def reset(connection):
+        connection.rollback()
+        connection.autocommit = False
+        return True
+
+    pool = pool_module.ConnectionPool(connect, {'MAX_SIZE': 2, 'TIMEOUT': 0, 'MAX_LIFETIME': 60})
+    first = pool.checkout()
+    first.connection.autocommit = True
+    pool.checkin(first, reset)
+    assert pool.checkout() is first
+    assert first.connection.rolled_back == 1 and first.connection.autocommit is False
+
+    second = pool.checkout()
+    with pytest.raises(utils.OperationalError):
+        pool.checkout()
+    assert pool.stats()['timeouts'] == 1
+    assert pool.stats()['in_use'] == 2
+
+    # connections past their lifetime are closed instead of going back to the pool
+    second.created -= 61
+    pool.checkin(second, reset)
+    assert second.connection.closed
+    assert pool.stats()['size'] == 1
+    assert pool.checkout_time.count == 2
+
+    # a forked child never touches the parent's connections
+    pool.checkin(first, reset)
+    monkeypatch.setattr(pool_module.os, 'getpid', lambda: -1)
+    child = pool.checkout()
+    assert child.connection is opened[-1] and child is not first
+    assert not first.connection.closed and first.connection in pool_module._abandoned
+
+
+def test_connection_pool_prewarms_min_size_in_parallel():
+    from django_iseries import pool as pool_module
+
+    class FakeConnection:
+        def close(self):
+            pass
+
+    pool = pool_module.ConnectionPool(lambda: (FakeConnection(), []), {'MIN_SIZE': 3})
+    threads = pool.prewarm()
+    assert len(threads) == 3
+    for thread in threads:
+        thread.join()
+    assert pool.stats()['idle'] == 3
+    assert pool.prewarm() == []
+
+
+def test_is_active_probes_at_most_once_per_interval(monkeypatch):
+    from django_iseries import pybase
+
+    class FakeCursor:
+        def __init__(self, connection):
+            self.connection = connection
+
+        def execute(self, sql, *args):
+            self.connection.executed.append(sql)
+            if not self.connection.alive:
+                raise pybase.Database.Error('08S01', 'Communication link failure')
+            return self
+
+        def fetchone(self):
+            return 1,
+
+        def close(self):
+            pass
+
+    class FakeConnection:
+        closed = False
+
+        def __init__(self):
+            self.alive = True
+            self.executed = []
+
+        def cursor(self):
+            return FakeCursor(self)
+
+    now = [1000.0]
+    monkeypatch.setattr(pybase.time, 'monotonic', lambda: now[0])
+    wrapper = pybase.DatabaseWrapper({'LIVENESS_INTERVAL': 10})
+    connection = FakeConnection()
+    wrapper._cursor(connection).execute('SELECT 1 FROM "T"')
+
+    now[0] += 5
+    assert wrapper.is_active(connection)
+    assert connection.executed == ['SELECT 1 FROM "T"']
+
+    now[0] += 10
+    assert wrapper.is_active(connection)
+    assert connection.executed[-1] == pybase.LIVENESS_PROBE_SQL
+
+    connection.alive = False
+    now[0] += 10
+    assert not wrapper.is_active(connection)
+    connection.closed = True
+    assert not wrapper.is_active(connection)
+    assert wrapper.liveness_stats() == {'probes': 2, 'broken_connections_caught': 2}
+
+
+def test_connection_pool_pings_idle_connections():
+    from django_iseries import pool as pool_module
+
+    class FakeConnection:
+        alive = True
+
+        def close(self):
+            pass
+
+    pool = pool_module.ConnectionPool(
+        lambda: (FakeConnection(), []), {'PING_INTERVAL': 1}, probe=lambda connection: connection.alive
+    )
+    healthy, broken = pool.checkout(), pool.checkout()
+    pool.checkin(healthy, lambda connection: True)
+    pool.checkin(broken, lambda connection: True)
+    broken.connection.alive = False
+    healthy.last_alive -= 1
+    broken.last_alive -= 1
+    assert pool.ping_idle() == 1
+    assert pool.idle_connections() == [healthy.connection]
+    assert pool.stats()['broken'] == 1
+
+
+def test_current_schema_is_cached_per_connection():
+    from django_iseries import pybase
+
+    class FakeCursor:
+        def __init__(self, connection):
+            self.connection = connection
+
+        def execute(self, sql, *args):
+            self.connection.executed.append(sql)
+            return self
+
+        def fetchone(self):
+            return 'APPLIB',
+
+    class FakeConnection:
+        def __init__(self):
+            self.executed = []
+
+        def cursor(self):
+            return FakeCursor(self)
+
+    wrapper = pybase.DatabaseWrapper()
+    connection = FakeConnection()
+    assert [wrapper._cursor(connection).get_current_schema() for _ in range(3)] == ['APPLIB'] * 3
+    assert len(connection.executed) == 1
+
+    wrapper._cursor(connection).set_current_schema('"MixedLib"')
+    assert wrapper._cursor(connection).get_current_schema() == 'MIXEDLIB'
+    assert len(connection.executed) == 2
+
+    wrapper._cursor(connection).execute('set schema ?', ['OTHERLIB'])
+    assert wrapper.current_schema is None
+    wrapper._cursor(connection).get_current_schema()
+    assert connection.executed[-1] == 'select CURRENT_SCHEMA from sysibm.sysdummy1'
+
+
+@pytest.mark.parametrize('offset_fetch,expected', [
+    (True, 'SELECT "TESTS_PERSON"."ID", "TESTS_PERSON"."FIRST_NAME", "TESTS_PERSON"."LAST_NAME" '
+           'FROM "TESTS_PERSON" ORDER BY "TESTS_PERSON"."LAST_NAME" ASC OFFSET 10 ROWS FETCH FIRST 20 ROWS ONLY'),
+    (False, 'SELECT M."COL1", M."COL2", M."COL3" FROM (SELECT Z.*, ROW_NUMBER() OVER(ORDER BY ORDER OF Z) '
+            'AS "__ROWNUM" FROM (SELECT "TESTS_PERSON"."ID" AS "COL1", "TESTS_PERSON"."FIRST_NAME" AS "COL2", '
+            '"TESTS_PERSON"."LAST_NAME" AS "COL3" FROM "TESTS_PERSON" ORDER BY "TESTS_PERSON"."LAST_NAME" ASC) Z) M '
+            'WHERE M."__ROWNUM" > 10 AND M."__ROWNUM" <= 30 ORDER BY M."__ROWNUM" OPTIMIZE FOR 20 ROWS'),
+])
+def test_sliced_query_sql(connection, offset_fetch, expected):
+    from tests.models import Person
+
+    connection.features.__dict__['supports_offset_fetch'] = offset_fetch
+    compiler = Person.objects.order_by('last_name')[10:30].query.get_compiler(connection=connection)
+    assert compiler.as_sql()[0] == expected
+
+
+def test_offset_fetch_detected_by_release(connection):
+    class FakeConnection:
+        def getinfo(self, info_type):
+            return '07.02.0000'
+
+    assert connection.databaseWrapper.get_server_version(FakeConnection()) == (7, 2, 0)
+    connection.connection = FakeConnection()
+    assert connection.features.supports_offset_fetch is False
+    connection.connection = None
+    connection.settings_dict['PAGINATION'] = 'OFFSET_FETCH'
+    del connection.features.supports_offset_fetch
+    assert connection.features.supports_offset_fetch is True
+
+
+def test_keyset_seek_sql_and_cursors(connection):
+    import datetime
+    import decimal
+
+    from django.core.paginator import InvalidPage
+    from django_iseries.pagination import decode_cursor, encode_cursor, seek
+    from tests.models import Person
+
+    connection.features.__dict__['supports_offset_fetch'] = True
+    queryset = seek(Person.objects.order_by('-last_name'), ['Smith', 7], size=20)
+    compiler = queryset.query.get_compiler(connection=connection)
+    assert compiler.as_sql() == (
+        'SELECT "TESTS_PERSON"."ID", "TESTS_PERSON"."FIRST_NAME", "TESTS_PERSON"."LAST_NAME" FROM "TESTS_PERSON" '
+        'WHERE "TESTS_PERSON"."LAST_NAME" <= %s AND ("TESTS_PERSON"."LAST_NAME", "TESTS_PERSON"."ID") < (%s, %s) '
+        'ORDER BY "TESTS_PERSON"."LAST_NAME" DESC, "TESTS_PERSON"."ID" DESC FETCH FIRST 20 ROWS ONLY',
+        ('Smith', 'Smith', 7),
+    )
+
+    values = [datetime.datetime(2020, 1, 2, 3, 4, 5), datetime.date(2020, 1, 2), decimal.Decimal('1.50'), 'x', 3]
+    assert decode_cursor(encode_cursor(values, backwards=True)) == (values, True)
+    with pytest.raises(InvalidPage):
+        decode_cursor('not a cursor')
+    with pytest.raises(ValueError):
+        seek(Person.objects.order_by('last_name', '-first_name'))
+
+
+def test_keyset_page_indexes_are_positions_within_the_page():
+    from django_iseries.pagination import KeysetPage, KeysetPaginator
+    from tests.models import Person
+
+    paginator = KeysetPaginator(Person.objects.order_by('pk'), 20)
+    page = KeysetPage(['a', 'b', 'c'], paginator, 'next', None)
+    assert (page.start_index(), page.end_index()) == (1, 3)
+    page = KeysetPage([], paginator, None, None)
+    assert (page.start_index(), page.end_index()) == (0, 0)
+
+
+@pytest.mark.parametrize('ordered', [True, False])
+def test_parallel_scan_merges_rrn_ranges(monkeypatch, ordered):
+    from django.db.models import QuerySet
+    from django_iseries import scan
+    from tests.models import Person
+
+    def iterator(queryset, chunk_size):
+        sql, params = queryset.query.get_compiler(queryset.db).as_sql()
+        assert sql.count('RRN("TESTS_PERSON")') == len(params) + ordered
+        low, high = (list(params) + [10])[:2]
+        return iter(range(low, high + 1))
+
+    monkeypatch.setattr(scan, 'rrn_upper_bound', lambda queryset: 10)
+    monkeypatch.setattr(QuerySet, 'iterator', iterator)
+    assert scan.rrn_ranges(10, 4) == [(1, 3), (4, 6), (7, 9), (10, None)]
+    assert scan.rrn_ranges(10, 8) == [(1, 2), (3, 4), (5, 6), (7, 8), (9, None)]
+    rows = list(scan.parallel_scan(Person.objects.all(), workers=2, ordered=ordered, chunk_size=2, buffer=1))
+    assert sorted(rows) == list(range(1, 11))
+    if ordered:
+        assert rows == list(range(1, 11))
+
+
+def test_compiled_sql_cache_rebinds_params(connection, settings):
+    from django.db.models import Q
+    from django_iseries import compiler as compiler_module
+    from tests.models import Person
+
+    connection.features.__dict__['supports_offset_fetch'] = True
+    connection.settings_dict['COMPILED_SQL_CACHE_SIZE'] = 10
+    compiler_module.compiled_sql_caches.pop(connection.alias, None)
+
+    def compile_people(name, ids):
+        queryset = Person.objects.filter(Q(first_name=name) | Q(last_name__icontains=name), id__in=ids)[:5]
+        compiler = queryset.query.get_compiler(connection=connection)
+        return compiler.as_sql(), compiler.col_count
+
+    (sql, params), col_count = compile_people('a', [1, 2])
+    assert compile_people('b', [3, 4]) == ((sql, ('b', '%b%', 3, 4)), col_count)
+    assert compile_people('c', [5])[0][1] == ('c', '%c%', 5)
+    assert Person.objects.filter(id__in=[5, 5]).query.get_compiler(connection=connection).as_sql()[1] == (5,)
+    stats = connection.compiled_sql_cache_stats()
+    assert (stats['hits'], stats['misses'], stats['size']) == (1, 3, 3)
+
+    settings.DEBUG = not settings.DEBUG
+    assert connection.compiled_sql_cache_stats()['size'] == 0
+
+
+def test_in_lists_are_padded_to_bucket_sizes(connection):
+    from tests.models import Person
+    from django_iseries.compiler import in_list_stats
+
+    connection.features.__dict__['supports_offset_fetch'] = True
+    connection.settings_dict['IN_LIST_BUCKETS'] = [2, 4]
+    in_list_stats.clear()
+
+    def compile_people(ids):
+        return Person.objects.filter(id__in=ids).query.get_compiler(connection=connection).as_sql()
+
+    sql, params = compile_people([1, 2, 3])
+    assert sql.endswith('WHERE "TESTS_PERSON"."ID" IN (%s, %s, %s, %s)')
+    assert params == (1, 2, 3, 3)
+    assert compile_people([7, 8, 9, 10]) == (sql, (7, 8, 9, 10))
+
+    sql, params = compile_people(list(range(1, 10)))
+    column = '"TESTS_PERSON"."ID"'
+    assert sql.endswith(
+        f'WHERE ({column} IN (%s, %s, %s, %s) OR {column} IN (%s, %s, %s, %s) OR {column} IN (%s, %s))'
+    )
+    assert params == (1, 2, 3, 4, 5, 6, 7, 8, 9, 9)
+
+    stats = connection.in_list_stats()
+    assert (stats['lists'], stats['padded_values'], stats['split_lists']) == (3, 2, 1)
+    assert (stats['texts'], stats['bucketed_texts'], stats['texts_saved']) == (3, 2, 1)
+
+
+def test_in_list_stats_remember_a_bounded_number_of_texts(settings):
+    from django_iseries.compiler import InListStats, in_list_stats
+
+    stats = InListStats(maxsize=2)
+    for count in range(1, 6):
+        stats.record('"ID"', count, (8,))
+    assert stats.stats() == {
+        'lists': 5, 'padded_values': 25, 'split_lists': 0, 'texts': 2, 'bucketed_texts': 1, 'texts_saved': 1,
+    }
+
+    in_list_stats.record('"ID"', 3, (4,))
+    settings.IN_LIST_STATS_RESET = True
+    assert in_list_stats.stats()['lists'] == 0
+    assert in_list_stats.stats()['texts'] == 0
+
+
+def test_with_isolation_sql(connection, monkeypatch):
+    from django.db import NotSupportedError
+    from django_iseries.compiler import SQLAggregateCompiler
+    from django_iseries.isolation import with_isolation
+    from tests.models import Person
+
+    connection.features.__dict__['supports_offset_fetch'] = True
+    monkeypatch.setattr(connection, 'get_autocommit', lambda: False)
+
+    def compile_sql(queryset):
+        return queryset.query.get_compiler(connection=connection).as_sql()[0]
+
+    people = with_isolation(Person.objects.all(), 'ur')
+    sql = compile_sql(people.filter(id__in=Person.objects.filter(first_name='a').values('id'))[:3])
+    assert sql.endswith('WHERE U0."FIRST_NAME" = %s) FETCH FIRST 3 ROWS ONLY WITH UR')
+    assert sql.count(' WITH ') == 1
+    assert compile_sql(people.union(Person.objects.all())).count(' WITH UR') == 1
+    locked = Person.objects.select_for_update(skip_locked=True)
+    assert compile_sql(with_isolation(locked, 'RS')).endswith('FOR UPDATE WITH RS SKIP LOCKED DATA')
+    with pytest.raises(NotSupportedError):
+        compile_sql(with_isolation(locked, 'UR'))
+    with pytest.raises(ValueError):
+        with_isolation(people, 'XX')
+
+    counted = []
+    monkeypatch.setattr(
+        SQLAggregateCompiler, 'execute_sql', lambda self, *args: counted.append(self.as_sql()[0]) or (0,)
+    )
+    people.distinct().using(connection.alias).count()
+    assert counted[0].endswith(') subquery WITH UR')
+
+    connection.settings_dict['ISOLATION'] = 'UR'
+    assert compile_sql(Person.objects.all()).endswith('FROM "TESTS_PERSON" WITH UR')
+    assert compile_sql(with_isolation(Person.objects.all(), 'CS')).endswith(' WITH CS')
+    assert compile_sql(Person.objects.select_for_update()).endswith('FOR UPDATE')
+
+
+@pytest.mark.parametrize('offset_fetch,slice_,rows,expected_end', [
+    (True, slice(10, 35), None, 'ORDER BY "TESTS_PERSON"."ID" ASC OFFSET 10 ROWS FETCH FIRST 25 ROWS ONLY'),
+    (False, slice(10, 35), None, 'ORDER BY M."__ROWNUM" OPTIMIZE FOR 25 ROWS'),
+    (True, slice(None, 1), 5, 'FETCH FIRST 1 ROWS ONLY OPTIMIZE FOR 5 ROWS'),
+    (True, None, 20, 'ORDER BY "TESTS_PERSON"."ID" ASC OPTIMIZE FOR 20 ROWS'),
+    (True, None, None, 'ORDER BY "TESTS_PERSON"."ID" ASC'),
+])
+def test_optimize_for_sql(connection, offset_fetch, slice_, rows, expected_end):
+    from django_iseries.query import optimize_for
+    from tests.models import Person
+
+    connection.features.__dict__['supports_offset_fetch'] = offset_fetch
+    queryset = optimize_for(Person.objects.order_by('id'), rows)
+    if slice_ is not None:
+        queryset = queryset[slice_]
+    assert queryset.query.get_compiler(connection=connection).as_sql()[0].endswith(expected_end)
+
+
+def test_optimize_for_clause_order_and_iterator_chunks(connection, monkeypatch):
+    from django.db.models.sql.compiler import SQLCompiler as DjangoSQLCompiler
+    from django_iseries.isolation import with_isolation
+    from django_iseries.query import optimize_for
+    from tests.models import Person
+
+    monkeypatch.setattr(connection, 'get_autocommit', lambda: False)
+    locked = optimize_for(Person.objects.select_for_update(skip_locked=True), 5)
+    sql = with_isolation(locked, 'CS').query.get_compiler(connection=connection).as_sql()[0]
+    assert sql.endswith('FOR UPDATE OPTIMIZE FOR 5 ROWS WITH CS SKIP LOCKED DATA')
+
+    executed = []
+    monkeypatch.setattr(DjangoSQLCompiler, 'execute_sql', lambda self, *args: executed.append(self.as_sql()[0]))
+    compiler = Person.objects.all().query.get_compiler(connection=connection)
+    compiler.execute_sql(chunked_fetch=True, chunk_size=500)
+    compiler.execute_sql()
+    assert executed[0].endswith('FROM "TESTS_PERSON" OPTIMIZE FOR 500 ROWS')
+    assert executed[1].endswith('FROM "TESTS_PERSON"')
+
+
+@pytest.mark.parametrize('regexp_like,lookup,expected', [
+    (True, 'regex', 'REGEXP_LIKE("TESTS_PERSON"."FIRST_NAME", CAST(%s AS VARCHAR(32000) CCSID 1208), \'c\')'),
+    (True, 'iregex', 'REGEXP_LIKE("TESTS_PERSON"."FIRST_NAME", CAST(%s AS VARCHAR(32000) CCSID 1208), \'i\')'),
+    (False, 'iregex', 'XMLCAST(XMLQUERY(\'fn:matches(xs:string($c), xs:string($p), "i")\' '
+                      'PASSING "TESTS_PERSON"."FIRST_NAME" AS "c", CAST(%s AS VARCHAR(32000) CCSID 1208) AS "p") '
+                      'AS VARCHAR(5)) = \'true\''),
+])
+def test_regex_lookup_sql(connection, regexp_like, lookup, expected):
+    from tests.models import Person
+
+    connection.features.__dict__['supports_regexp_like'] = regexp_like
+    pattern = '^O\'Brien "[0-9]+%'
+    queryset = Person.objects.filter(**{f'first_name__{lookup}': pattern})
+    sql, params = queryset.query.get_compiler(connection=connection).as_sql()
+    assert sql.endswith(f'WHERE {expected}')
+    assert params == (pattern,)
+
+
+LAST_MODIFIED = '"TESTS_ITEM"."LAST_MODIFIED"'
+ITEM_DATE = '"TESTS_ITEM"."DATE"'
+
+
+@pytest.mark.parametrize('lookup,value,expected_sql,expected_params', [
+    ('last_modified__date', datetime.date(2025, 3, 4),
+     f'({LAST_MODIFIED} >= %s AND {LAST_MODIFIED} < %s)',
+     (datetime.datetime(2025, 3, 4), datetime.datetime(2025, 3, 5))),
+    ('last_modified__date__gt', datetime.date(2025, 3, 4), f'{LAST_MODIFIED} >= %s', (datetime.datetime(2025, 3, 5),)),
+    ('last_modified__date__gte', datetime.date(2025, 3, 4), f'{LAST_MODIFIED} >= %s', (datetime.datetime(2025, 3, 4),)),
+    ('last_modified__date__lt', datetime.date(2025, 3, 4), f'{LAST_MODIFIED} < %s', (datetime.datetime(2025, 3, 4),)),
+    ('last_modified__date__lte', datetime.date(2025, 3, 4), f'{LAST_MODIFIED} < %s', (datetime.datetime(2025, 3, 5),)),
+    ('last_modified__date__range', (datetime.date(2025, 3, 4), datetime.date(2025, 3, 6)),
+     f'({LAST_MODIFIED} >= %s AND {LAST_MODIFIED} < %s)',
+     (datetime.datetime(2025, 3, 4), datetime.datetime(2025, 3, 7))),
+    ('last_modified__year', 2025,
+     f'({LAST_MODIFIED} >= %s AND {LAST_MODIFIED} < %s)',
+     (datetime.datetime(2025, 1, 1), datetime.datetime(2026, 1, 1))),
+    ('last_modified__year__gt', 2025, f'{LAST_MODIFIED} >= %s', (datetime.datetime(2026, 1, 1),)),
+    ('last_modified__year__lt', 2025, f'{LAST_MODIFIED} < %s', (datetime.datetime(2025, 1, 1),)),
+    ('date__year', 2025, f'({ITEM_DATE} >= %s AND {ITEM_DATE} < %s)', ('2025-01-01', '2026-01-01')),
+    ('date__year__gte', 2025, f'{ITEM_DATE} >= %s', ('2025-01-01',)),
+    ('date__year__lte', 2025, f'{ITEM_DATE} < %s', ('2026-01-01',)),
+    ('date__year__range', (2024, 2025), f'({ITEM_DATE} >= %s AND {ITEM_DATE} < %s)', ('2024-01-01', '2026-01-01')),
+    ('date__year', 9999, f'{ITEM_DATE} BETWEEN %s AND %s', (datetime.date(9999, 1, 1), datetime.date(9999, 12, 31))),
+    ('date__month', 3, f'MONTH({ITEM_DATE}) = %s', (3,)),
+    ('date__quarter', 1, f'QUARTER({ITEM_DATE}) = %s', (1,)),
+    ('date__week', 10, f'WEEK_ISO({ITEM_DATE}) = %s', (10,)),
+    ('date__week_day', 2, f'DAYOFWEEK({ITEM_DATE}) = %s', (2,)),
+    ('date__iso_week_day', 1, f'DAYOFWEEK_ISO({ITEM_DATE}) = %s', (1,)),
+    ('last_modified__hour', 7, f'HOUR({LAST_MODIFIED}) = %s', (7,)),
+    ('last_modified__iso_year__in', [2025],
+     f'YEAR({LAST_MODIFIED} + (4 - DAYOFWEEK_ISO({LAST_MODIFIED})) DAYS) IN (%s)', (2025,)),
+])
+def test_date_lookup_sql(connection, settings, lookup, value, expected_sql, expected_params):
+    from tests.models import Item
+
+    settings.USE_TZ = False
+    queryset = Item.objects.filter(**{lookup: value})
+    sql, params = queryset.query.get_compiler(connection=connection).as_sql()
+    assert sql.endswith(f'WHERE {expected_sql}')
+    assert params == expected_params
+
+
+@pytest.mark.parametrize('field,kind,trunc_timestamp,expected', [
+    ('last_modified', 'year', True, f"TRUNC_TIMESTAMP({LAST_MODIFIED}, 'YEAR')"),
+    ('last_modified', 'quarter', True, f"TRUNC_TIMESTAMP({LAST_MODIFIED}, 'Q')"),
+    ('last_modified', 'week', True, f"TRUNC_TIMESTAMP({LAST_MODIFIED}, 'IW')"),
+    ('last_modified', 'day', True, f"TRUNC_TIMESTAMP({LAST_MODIFIED}, 'DD')"),
+    ('last_modified', 'hour', True, f"TRUNC_TIMESTAMP({LAST_MODIFIED}, 'HH')"),
+    ('last_modified', 'minute', True, f"TRUNC_TIMESTAMP({LAST_MODIFIED}, 'MI')"),
+    ('last_modified', 'second', True, f"TRUNC_TIMESTAMP({LAST_MODIFIED}, 'SS')"),
+    ('last_modified', 'minute', False,
+     f'TIMESTAMP(DATE({LAST_MODIFIED}), TIME({LAST_MODIFIED}) - SECOND({LAST_MODIFIED}) SECONDS)'),
+    ('last_modified', 'second', False, f'TIMESTAMP(DATE({LAST_MODIFIED}), TIME({LAST_MODIFIED}))'),
+    ('last_modified', 'month', False,
+     f"TIMESTAMP(DATE({LAST_MODIFIED}) - (DAY({LAST_MODIFIED}) - 1) DAYS, TIME('00:00:00'))"),
+    ('date', 'month', True, f"DATE(TRUNC_TIMESTAMP(TIMESTAMP({ITEM_DATE}, TIME('00:00:00')), 'MONTH'))"),
+    ('date', 'day', True, f'DATE({ITEM_DATE})'),
+    ('date', 'year', False, f'DATE({ITEM_DATE}) - (DAYOFYEAR({ITEM_DATE}) - 1) DAYS'),
+    ('date', 'quarter', False,
+     f'DATE({ITEM_DATE}) - (DAY({ITEM_DATE}) - 1) DAYS - MOD(MONTH({ITEM_DATE}) - 1, 3) MONTHS'),
+    ('date', 'week', False, f'DATE({ITEM_DATE}) - (DAYOFWEEK_ISO({ITEM_DATE}) - 1) DAYS'),
+])
+def test_trunc_sql(connection, settings, field, kind, trunc_timestamp, expected):
+    from django.db.models.functions import Trunc
+    from tests.models import Item
+
+    settings.USE_TZ = False
+    connection.features.__dict__['supports_trunc_timestamp'] = trunc_timestamp
+    queryset = Item.objects.annotate(truncated=Trunc(field, kind)).values('truncated')
+    sql, params = queryset.query.get_compiler(connection=connection).as_sql()
+    assert sql == f'SELECT {expected} AS "TRUNCATED" FROM "TESTS_ITEM"'
+    assert params == ()
+
+
+def test_trunc_setting_skips_release_detection(connection):
+    connection.settings_dict['TRUNC'] = 'ARITHMETIC'
+    assert connection.features.supports_trunc_timestamp is False
+    connection.settings_dict['TRUNC'] = 'TRUNC_TIMESTAMP'
+    del connection.features.supports_trunc_timestamp
+    assert connection.features.supports_trunc_timestamp is True
+
+
+def test_bulk_batch_size_fits_marker_and_statement_limits(connection):
+    from tests.models import Person
+
+    fields = [Person._meta.get_field('first_name'), Person._meta.get_field('last_name')]
+    rows = connection.ops.bulk_batch_size(fields, [])
+    header = 64 + len('"FIRST_NAME"') + len('"LAST_NAME"') + 2 * len('"TESTS_PERSON"') + 4 * 2
+    assert rows == (32767 - header) // 8
+    assert header + rows * 8 <= 32767
+
+    connection.settings_dict['MAX_STATEMENT_LENGTH'] = 2 * 1024 * 1024
+    assert connection.ops.bulk_batch_size(fields, []) == 32767 // 2
+    connection.settings_dict['MAX_STATEMENT_PARAMS'] = 1000
+    assert connection.ops.bulk_batch_size(['pk', 'pk'] + fields, []) == 250
+
+
+def test_bulk_insert_chooses_executemany_by_cost(connection, monkeypatch):
+    from django.db.models.sql import InsertQuery
+    from tests.models import Person
+
+    executed = []
+
+    class FakeCursor:
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc_info):
+            pass
+
+        def execute(self, sql, params=None):
+            executed.append(('execute', sql, params))
+
+        def executemany(self, sql, param_list):
+            executed.append(('executemany', sql, param_list))
+
+    monkeypatch.setattr(connection, 'cursor', FakeCursor)
+    connection.settings_dict['BULK_INSERT_COSTS'] = {'VALUES_STATEMENT': 1, 'EXECUTEMANY_STATEMENT': 2}
+    assert not connection.ops.use_executemany_for_insert(30)
+    assert connection.ops.use_executemany_for_insert(40)
+
+    def bulk_insert(people):
+        query = InsertQuery(Person)
+        query.insert_values([Person._meta.get_field('first_name'), Person._meta.get_field('last_name')], people)
+        return query.get_compiler(connection=connection).execute_sql()
+
+    people = [Person(first_name=f'F{i}', last_name=f'L{i}') for i in range(40)]
+    bulk_insert(people)
+    (method, sql, params), = executed
+    assert method == 'executemany'
+    assert sql == 'INSERT INTO "TESTS_PERSON" ("FIRST_NAME", "LAST_NAME") VALUES (%s, %s)'
+    assert list(params[0]) == ['F0', 'L0'] and len(params) == 40
+
+    executed.clear()
+    bulk_insert(people[:30])
+    (method, sql, params), = executed
+    assert method == 'execute'
+    assert sql.startswith('INSERT INTO "TESTS_PERSON" ("FIRST_NAME", "LAST_NAME") VALUES')
+    assert len(params) == 60
+
+
+def test_bulk_upsert_merges_and_returns_ids_in_input_order(connection, monkeypatch):
+    from django.db.models.constants import OnConflict
+    from django.db.models.sql import InsertQuery
+    from django_iseries.upsert import upsert_fields
+    from tests.models import Square, StockLevel
+
+    executed = []
+
+    class FakeCursor:
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc_info):
+            pass
+
+        def execute(self, sql, params=None):
+            executed.append((sql, params))
+
+        def fetchall(self):
+            # MERGE returns updated and inserted rows in no particular order
+            return [(12, 3), (11, 2)]
+
+    monkeypatch.setattr(connection, 'cursor', FakeCursor)
+    opts = Square._meta
+    query = InsertQuery(
+        Square, on_conflict=OnConflict.UPDATE,
+        update_fields=[opts.get_field('square')], unique_fields=[opts.get_field('root')],
+    )
+    query.insert_values([opts.get_field('root'), opts.get_field('square')], [Square(root=2, square=4), Square(root=3, square=9)])
+    rows = query.get_compiler(connection=connection).execute_sql([opts.pk])
+    (sql, params), = executed
+    assert sql == (
+        'SELECT "ID", "ROOT" FROM FINAL TABLE (MERGE INTO "TESTS_SQUARE" AS T USING (VALUES '
+        '(CAST(%s AS INTEGER), CAST(%s AS INTEGER)), (CAST(%s AS INTEGER), CAST(%s AS INTEGER))) '
+        'AS S ("ROOT", "SQUARE") ON T."ROOT" = S."ROOT" WHEN MATCHED THEN UPDATE SET "SQUARE" = S."SQUARE" '
+        'WHEN NOT MATCHED THEN INSERT ("ROOT", "SQUARE") VALUES (S."ROOT", S."SQUARE")) as tests_square'
+    )
+    assert params == [2, 4, 3, 9]
+    assert rows == [(11,), (12,)]
+
+    # a generated pk never matches: plain multi-row insert, read back in input order
+    executed.clear()
+    query = InsertQuery(
+        Square, on_conflict=OnConflict.UPDATE,
+        update_fields=[opts.get_field('square')], unique_fields=[opts.pk],
+    )
+    query.insert_values([opts.get_field('root'), opts.get_field('square')], [Square(root=2, square=4), Square(root=3, square=9)])
+    query.get_compiler(connection=connection).execute_sql([opts.pk])
+    (sql, params), = executed
+    assert sql.startswith('SELECT "ID" FROM FINAL TABLE (INSERT INTO "TESTS_SQUARE"')
+    assert sql.endswith(' ORDER BY INPUT SEQUENCE')
+
+    assert upsert_fields(StockLevel._meta) == (['warehouse', 'sku'], ['quantity'])
+    assert upsert_fields(opts, ['root']) == (['root'], ['square'])
+
+
+def test_bulk_upsert_matches_keys_as_the_columns_store_them(connection, monkeypatch):
+    import datetime
+    import decimal
+
+    from django.db import models
+    from django.db.models.constants import OnConflict
+    from django.db.models.sql import InsertQuery
+    from django_iseries.compiler import merge_key
+    from tests.models import Item
+
+    class FakeCursor:
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc_info):
+            pass
+
+        def execute(self, sql, params=None):
+            pass
+
+        def fetchall(self):
+            # TIME has no fractional seconds
+            return [(8, datetime.time(9, 0, 1)), (7, datetime.time(8, 30, 15))]
+
+    monkeypatch.setattr(connection, 'cursor', FakeCursor)
+    opts = Item._meta
+    query = InsertQuery(
+        Item, on_conflict=OnConflict.UPDATE,
+        update_fields=[opts.get_field('name')], unique_fields=[opts.get_field('time')],
+    )
+    moment = datetime.datetime(2025, 1, 2, 3, 4, 5)
+    items = [
+        Item(name='a', date=moment.date(), time=datetime.time(8, 30, 15, 250000), last_modified=moment),
+        Item(name='b', date=moment.date(), time=datetime.time(9, 0, 1, 999999), last_modified=moment),
+    ]
+    query.insert_values([opts.get_field(name) for name in ('name', 'date', 'time', 'last_modified')], items)
+    assert query.get_compiler(connection=connection).execute_sql([opts.pk]) == [(7,), (8,)]
+
+    amount = models.DecimalField(max_digits=11, decimal_places=2)
+    assert merge_key([amount], [1.005]) == merge_key([amount], [decimal.Decimal('1.00')])
+    assert merge_key([amount], ['12.5']) == merge_key([amount], [decimal.Decimal('12.50')])
+
+
+def test_bulk_update_merges_against_values(connection):
+    from django.db.models import Case, Q, Value, When
+    from django.db.models.sql import UpdateQuery
+    from tests.models import Person
+
+    opts = Person._meta
+    people = [Person(pk=1, first_name='Ada', last_name='L'), Person(pk=2, first_name='Alan', last_name=None)]
+
+    def update_sql(where=None):
+        # what QuerySet.bulk_update() builds for each batch
+        query = UpdateQuery(Person)
+        query.add_q(where or Q(pk__in=[person.pk for person in people]))
+        query.add_update_values({
+            name: Case(*(
+                When(pk=person.pk, then=Value(getattr(person, name), output_field=opts.get_field(name)))
+                for person in people
+            ), output_field=opts.get_field(name))
+            for name in ('first_name', 'last_name')
+        })
+        return query.get_compiler(connection=connection).as_sql()
+
+    sql, params = update_sql()
+    varchar = 'VARCHAR(20) CCSID 1208'
+    assert sql == (
+        'MERGE INTO "TESTS_PERSON" AS T USING (VALUES '
+        f'(CAST(%s AS INTEGER), CAST(%s AS {varchar}), CAST(%s AS {varchar})), '
+        f'(CAST(%s AS INTEGER), CAST(%s AS {varchar}), CAST(NULL AS {varchar}))) '
+        'AS S ("ID", "FIRST_NAME", "LAST_NAME") ON T."ID" = S."ID" '
+        'WHEN MATCHED THEN UPDATE SET "FIRST_NAME" = S."FIRST_NAME", "LAST_NAME" = S."LAST_NAME"'
+    )
+    assert params == (1, 'Ada', 'L', 2, 'Alan')
+
+    # a queryset with filters of its own keeps the CASE form
+    sql, params = update_sql(Q(pk__in=[1, 2]) & Q(first_name='x'))
+    assert sql.startswith('UPDATE "TESTS_PERSON" SET "FIRST_NAME" = CASE WHEN')
+
+    fields = [opts.pk, opts.pk, opts.get_field('first_name')]
+    rows = connection.ops.bulk_batch_size(fields, [])
+    assert rows == connection.ops.merge_batch_size(fields[1:])
+    assert rows * (len('(CAST(? AS INTEGER), ') + len(f'CAST(? AS {varchar}), ')) < 32767
+
+    connection.features.__dict__['supports_bulk_update_merge'] = False
+    assert update_sql()[0].startswith('UPDATE "TESTS_PERSON" SET')
+    assert connection.ops.bulk_batch_size(fields, []) > rows
+
+
+def test_large_in_lists_are_staged_in_qtemp(connection, monkeypatch):
+    from django.db.models.sql.constants import MULTI
+    from tests.models import Person
+
+    executed = []
+
+    class FakeCursor:
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc_info):
+            pass
+
+        def execute(self, sql, params=None):
+            executed.append((sql.split(' (')[0] if sql.startswith('DECLARE') else sql, params))
+
+        def executemany(self, sql, param_list):
+            executed.append((sql, list(param_list)))
+
+        def fetchmany(self, size):
+            rows, self.rows = getattr(self, 'rows', [(1, 'Ada', 'L')]), []
+            return rows
+
+        def close(self):
+            pass
+
+    monkeypatch.setattr(connection, 'cursor', FakeCursor)
+    monkeypatch.setattr(connection, 'chunked_cursor', FakeCursor)
+    connection.settings_dict['IN_LIST_STAGING_THRESHOLD'] = 3
+    compiler = Person.objects.filter(id__in=[1, 2, 3, 4]).query.get_compiler(connection=connection)
+    assert compiler.as_sql()[1] == (1, 2, 3, 4)
+
+    assert compiler.execute_sql(MULTI) == [[(1, 'Ada', 'L')]]
+    declare, insert, select, drop = executed
+    assert declare == ('DECLARE GLOBAL TEMPORARY TABLE SESSION.ISERIES_KEYS_0', None)
+    assert insert == (
+        'INSERT INTO SESSION.ISERIES_KEYS_0 (SET_ID, KEY_VALUE) VALUES (%s, %s)', [(0, 1), (0, 2), (0, 3), (0, 4)]
+    )
+    assert select[0].endswith(
+        'WHERE EXISTS (SELECT 1 FROM SESSION.ISERIES_KEYS_0 K WHERE K.SET_ID = %s AND K.KEY_VALUE = "TESTS_PERSON"."ID")'
+    )
+    assert select[1] == (0,)
+    assert drop == ('DROP TABLE SESSION.ISERIES_KEYS_0', None)
+    assert connection.key_staging is None and not connection.databaseWrapper.staged_tables
+
+    # an iterator() keeps its table until the last row is read; other statements meanwhile use another
+    executed.clear()
+    chunks = compiler.execute_sql(MULTI, chunked_fetch=True)
+    assert connection.databaseWrapper.staged_tables == {'SESSION.ISERIES_KEYS_0'}
+    Person.objects.filter(id__in=[5, 6, 7, 8]).query.get_compiler(connection=connection).execute_sql(MULTI)
+    assert executed[-1] == ('DROP TABLE SESSION.ISERIES_KEYS_1', None)
+    assert list(chunks) == [[(1, 'Ada', 'L')]]
+    assert executed[-1] == ('DROP TABLE SESSION.ISERIES_KEYS_0', None)
+
+
+def test_insert_reads_back_only_unknown_returning_fields(connection, monkeypatch):
+    from django.db.models.sql import InsertQuery
+    from tests.models import Person
+
+    executed = []
+
+    class FakeCursor:
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc_info):
+            pass
+
+        def execute(self, sql, params=None):
+            executed.append(sql)
+
+        def fetchall(self):
+            return [(1,), (2,)]
+
+    monkeypatch.setattr(connection, 'cursor', FakeCursor)
+    opts = Person._meta
+    names = [opts.get_field('first_name'), opts.get_field('last_name')]
+
+    def insert(model, fields, objs):
+        executed.clear()
+        query = InsertQuery(model)
+        query.insert_values(fields, objs)
+        return query.get_compiler(connection=connection).execute_sql([model._meta.pk])
+
+    people = [Person(first_name='Ada', last_name='L'), Person(first_name='Alan', last_name='T')]
+    assert insert(Person, names, people) == [(1,), (2,)]
+    assert executed[0].startswith('SELECT "ID" FROM FINAL TABLE (INSERT INTO "TESTS_PERSON"')
+    assert executed[0].endswith(') as tests_person ORDER BY INPUT SEQUENCE')
+
+    # client supplied primary keys are known without a result set
+    people = [Person(pk=7, first_name='Ada', last_name='L'), Person(pk=9, first_name='Alan', last_name='T')]
+    assert insert(Person, [opts.pk, *names], people) == [(7,), (9,)]
+    assert executed[0].startswith('INSERT INTO "TESTS_PERSON" ("ID", "FIRST_NAME", "LAST_NAME") VALUES')
+
+    # auto-created many-to-many rows saved directly need their ids as well
+    through = Object.related_objects.through
+    fields = [through._meta.get_field('from_object'), through._meta.get_field('to_object')]
+    rows = [through(from_object_id=1, to_object_id=2), through(from_object_id=1, to_object_id=3)]
+    assert insert(through, fields, rows) == [(1,), (2,)]
+    assert executed[0].startswith('SELECT "ID" FROM FINAL TABLE (INSERT INTO "TESTS_OBJECT_RELATED_OBJECTS"')
+
+
+def test_bulk_update_of_inherited_fields_filters_parent_rows(connection, monkeypatch):
+    from django.db.models import Case, Q, Value, When
+    from django.db.models.sql import UpdateQuery
+    from django.db import connections
+    from django.db.models.sql.constants import CURSOR
+    from tests.models import Child
+
+    executed = []
+
+    class FakeCursor:
+        rowcount = 2
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc_info):
+            pass
+
+        def execute(self, sql, params=None):
+            executed.append((sql, params))
+
+        def fetchmany(self, size):
+            rows, self.rows = getattr(self, 'rows', [(1,), (2,)]), []
+            return rows
+
+        def close(self):
+            pass
+
+    monkeypatch.setattr(connection, 'cursor', FakeCursor)
+    opts = Child._meta
+    children = [Child(pk=1, name='a', age=3), Child(pk=2, name='b', age=4)]
+    query = UpdateQuery(Child)
+    query.add_q(Q(pk__in=[1, 2]))
+    query.add_update_values({
+        name: Case(*(
+            When(pk=child.pk, then=Value(getattr(child, name), output_field=opts.get_field(name)))
+            for child in children
+        ), output_field=opts.get_field(name))
+        for name in ('name', 'age')
+    })
+    # the parent update runs on a compiler of its own, looked up by alias
+    monkeypatch.setattr(type(connections), '__getitem__', lambda self, alias: connection)
+    query.get_compiler(using=connection.alias).execute_sql(CURSOR)
+    child_sql, parent_sql = [sql for sql, _ in executed if sql.startswith('UPDATE')]
+    assert child_sql.startswith('UPDATE "TESTS_CHILD" SET "AGE" = CASE')
+    assert parent_sql.startswith('UPDATE "TESTS_PARENT" SET "NAME" = CASE')
+    assert parent_sql.endswith('WHERE "TESTS_PARENT"."ID" IN (%s, %s)')
+
+
+def test_iseries_queryset_combines_statement_clauses(connection):
+    from django_iseries.managers import ISeriesQuerySet
+    from tests.models import Person
+
+    connection.features.__dict__['supports_offset_fetch'] = True
+    queryset = ISeriesQuerySet(Person).with_isolation('UR').optimize_for(25)
+    sql, _ = queryset.query.get_compiler(connection=connection).as_sql()
+    assert sql.endswith('FROM "TESTS_PERSON" OPTIMIZE FOR 25 ROWS WITH UR')
+    assert all(hasattr(queryset, name) for name in ('seek', 'cursor_for', 'bulk_upsert'))
@@ -0,0 +1,82 @@
+"""
+Equivalence corpus for the select-clause placeholder scanner in django_iseries.pybase.
+
+The scanner replaced a sqlparse based implementation; ``sqlparse_select_clause_rewrite`` keeps that
+implementation as the reference the scanner must agree with.
+"""
+import pytest
+
+from django_iseries.pybase import DB2CursorWrapper, SelectRewrite
+
+CORPUS = [
+    'SELECT "A", "B" FROM "T" WHERE "C" = ?',
+    'SELECT ? AS "A" FROM "T"',
+    'select ? as "a", "b" from "t" where "c" = ? and "d" = ?',
+    'SELECT ?, ?, "X" FROM "T" WHERE "Y" IN (?, ?, ?)',
+    'SELECT "A" FROM "T" WHERE "B" IN (SELECT ? FROM "U" WHERE "C" = ?)',
+    'SELECT ? FROM "T" WHERE EXISTS (SELECT 1 FROM "U" WHERE "U"."A" = ?) AND "B" = ?',
+    'SELECT (SELECT ? FROM SYSIBM.SYSDUMMY1), ? FROM "T"',
+    'SELECT \'?\' AS "Q", ? FROM "T"',
+    'SELECT \'it\'\'s ? FROM\', ? FROM "T" WHERE "A" = ?',
+    'SELECT "FROM", ? FROM "T"',
+    'SELECT "A""?", ? FROM "T" WHERE "B" = ?',
+    'SELECT "A" -- ? FROM\nFROM "T" WHERE "B" = ?',
+    'SELECT /* ? FROM */ ? FROM "T" WHERE "B" = ?',
+    'SELECT EXTRACT(YEAR FROM "D"), ? FROM "T"',
+    'SELECT COUNT(*) FROM (SELECT ? AS "X" FROM "T" WHERE "Y" = ?) SUBQUERY',
+    'INSERT INTO "T" ("A", "B") VALUES (?, ?)',
+    'INSERT INTO "T" ("A") SELECT ? FROM SYSIBM.SYSDUMMY1',
+    'UPDATE "T" SET "A" = ? WHERE "B" = ?',
+    'DELETE FROM "T" WHERE "A" = ?',
+    'SELECT "T"."FROM_DATE", ? FROM "T"',
+    'SELECT "SELECTED", ? FROM "T"',
+    'SELECT ? FROM "T" UNION ALL SELECT ? FROM "U" WHERE "A" = ?',
+    'SELECT CASE WHEN "A" = ? THEN ? ELSE ? END FROM "T" WHERE "B" = ?',
+    'SELECT "A" FROM "T" ORDER BY "A" FETCH FIRST 10 ROWS ONLY',
+    'SELECT "A" FROM "T" WHERE "B" LIKE ? ESCAPE \'\\\'',
+    'SELECT "A",\n       ?\n  FROM "T"\n WHERE "B" = ?',
+    'SELECT RRN(T), "A" FROM T WHERE RRN(T) > ?',
+    'SELECT "A" FROM "T" WHERE "B" = \'SELECT ?\' AND "C" = ?',
+    'WITH X AS (SELECT ? AS "V" FROM SYSIBM.SYSDUMMY1) SELECT "V", ? FROM X',
+    'SELECT "A" FROM "T" WHERE "B" = ? FOR UPDATE SKIP LOCKED DATA',
+]
+
+
+def sqlparse_select_clause_rewrite(query):
+    sqlparse = pytest.importorskip('sqlparse')
+    pieces = []
+    literal_positions = []
+    current_param_idx = -1
+    in_select_clause = False
+    tmp = []
+    for t in sqlparse.parse(query)[0].flatten():
+        if t.ttype == sqlparse.tokens.Name.Placeholder:
+            current_param_idx += 1
+            if in_select_clause:
+                pieces.append(''.join(tmp))
+                literal_positions.append(current_param_idx)
+                tmp = []
+                continue
+        elif t.normalized == 'SELECT':
+            in_select_clause = True
+        elif t.normalized == 'FROM':
+            in_select_clause = False
+        tmp.append(str(t))
+    pieces.append(''.join(tmp))
+    return SelectRewrite(tuple(pieces), tuple(literal_positions))
+
+
+def scanner_select_clause_rewrite(query):
+    cursor = DB2CursorWrapper.__new__(DB2CursorWrapper)
+    # noinspection PyProtectedMember
+    return cursor._select_clause_rewrite(query)
+
+
+@pytest.mark.parametrize('query', CORPUS)
+def test_scanner_matches_sqlparse(query):
+    assert scanner_select_clause_rewrite(query) == sqlparse_select_clause_rewrite(query)
+
+
+def test_scanner_stops_after_last_select_clause():
+    query = 'SELECT "A" FROM "T" WHERE "B" = ? AND "C" = ?'
+    assert scanner_select_clause_rewrite(query) == SelectRewrite((query,), ())